@@ -0,0 +1,262 @@
+"""Batched engine that plays many games in lockstep with NumPy.
+BatchEngine holds count games at once: their boards are one (count, rows, cols) array and their live pieces are
+arrays of piece types, rotations, rows and cols.  Each step() takes one action per game and applies all of them with
+whole-batch array operations, so the per-game cost is a few array elements rather than a Python call.
+The rules are the same as GameEngine's (see engine.py) and come from the same PieceSet tables: pieces spawn in the
+same place, rotate with the same wall kicks, lock when a soft drop can't move them or when hard dropped, and the game
+is lost if a new piece doesn't fit or the buffer rows aren't empty.  There is no gravity, hold or undo; every step is
+one input.
+A BatchEngine can also write every step, as (boards, actions, rewards) records, into a SharedRing (see ring.py) for
+another process to read as it plays; see ring_fields().
+"""
+
+import numpy as np
+from pieces import tetrominoes
+
+# Actions, one per game per step.
+NOOP = 0
+LEFT = 1
+RIGHT = 2
+DOWN = 3    # Soft drop: descend 1 row, or lock if the piece can't.
+CW = 4
+CCW = 5
+HARD_DROP = 6
+action_names = ("noop", "l", "r", "d", "cw", "ccw", "hard_drop")
+
+
+def piece_arrays(pieces):
+    """Returns a PieceSet's tables as arrays, for BatchEngine.
+    cells[piece_type, rotation] is a (size, 2) array of (row, col) cells, where size is the most cells any piece has.
+    Smaller pieces repeat their first cell, which changes nothing when testing or placing them.
+    kicks[piece_type, rotation, direction] is a (kick count, 2) array of (row, col) kicks, with direction 0 for
+    clockwise and 1 for counterclockwise.  Shorter kick lists repeat their last kick.
+    spawn_rows[piece_type] and box_sizes[piece_type] are as in the PieceSet.
+    """
+    size = max(len(shape.cells) for shapes in pieces.shapes for shape in shapes)
+    cells = np.array([[list(shape.cells) + [shape.cells[0]] * (size - len(shape.cells)) for shape in shapes]
+                      for shapes in pieces.shapes], dtype=np.int64)
+    kick_count = max(len(offsets) for kicks in pieces.wall_kicks for offsets in kicks.values())
+    kicks = np.array([[[list(kicks[(rotation, (rotation + step) % 4)])
+                        + [kicks[(rotation, (rotation + step) % 4)][-1]]
+                        * (kick_count - len(kicks[(rotation, (rotation + step) % 4)]))
+                        for step in (1, -1)]
+                       for rotation in range(4)]
+                      for kicks in pieces.wall_kicks], dtype=np.int64)
+    return cells, kicks, np.array(pieces.spawn_rows, dtype=np.int64), np.array(pieces.box_sizes, dtype=np.int64)
+
+
+def ring_fields(count, dimensions=(22, 10)):
+    """Returns the fields of the SharedRing records a BatchEngine of count games writes, one per step:
+    board: every game's dead cells before the step, (count, rows, cols).
+    action: the action each game took.  Lost games take NOOP.
+    reward: the lines each game cleared.
+    """
+    return (("board", (count,) + tuple(dimensions), "uint8"),
+            ("action", (count,), "int64"),
+            ("reward", (count,), "int64"))
+
+
+class BatchEngine:
+    """count games of Tetris, stepped together.
+    count: how many games to play at once.
+    dimensions: a tuple. (rows, cols), including the 2 buffer rows at the top.
+    seed: seed for the batch's random number generator.  None seeds from the OS.
+    pieces: the pieces.PieceSet to play with.  None plays with pieces.tetrominoes.
+    randomizer: how pieces are dealt.  "uniform" or "bag"; see randomizer.py.
+    ring: a SharedRing with ring_fields() to write each step to, in lane.  None doesn't write steps anywhere.
+    State, all indexed by game:
+    boards: uint8 array of dead cells, (count, rows, cols).
+    piece_type, rotation, row, col: the live piece's pose.
+    next_piece: the piece that will spawn next.
+    score: lines cleared.  pieces_placed: pieces locked.
+    game_over: whether the game is lost.  Lost games ignore their actions until reset().
+    """
+
+    def __init__(self, count, dimensions=(22, 10), seed=None, pieces=None, randomizer="uniform", ring=None, lane=0):
+        if randomizer not in ("uniform", "bag"):
+            raise ValueError("randomizer must be either 'uniform' or 'bag'.")
+        self.count = count
+        self.rows, self.cols = dimensions
+        self.pieces = tetrominoes if pieces is None else pieces
+        self.cells, self.kicks, self.spawn_rows, self.box_sizes = piece_arrays(self.pieces)
+        self.randomizer = randomizer
+        self.rng = np.random.default_rng(seed)
+        self.ring = ring
+        self.lane = lane
+
+        self.boards = np.zeros((count, self.rows, self.cols), dtype=np.uint8)
+        self.piece_type = np.zeros(count, dtype=np.int64)
+        self.rotation = np.zeros(count, dtype=np.int64)
+        self.row = np.zeros(count, dtype=np.int64)
+        self.col = np.zeros(count, dtype=np.int64)
+        self.next_piece = np.zeros(count, dtype=np.int64)
+        self.score = np.zeros(count, dtype=np.int64)
+        self.pieces_placed = np.zeros(count, dtype=np.int64)
+        self.game_over = np.zeros(count, dtype=bool)
+        # Each game's current bag, and how many pieces of it have been dealt.
+        self.bags = np.zeros((count, len(self.pieces)), dtype=np.int64)
+        self.bag_index = np.full(count, len(self.pieces), dtype=np.int64)
+        self.reset()
+
+    def reset(self, games=None):
+        """Starts new games.
+        games: a bool mask or index array of the games to reset.  None resets every game.
+        """
+        games = np.arange(self.count) if games is None else self._indices(games)
+        self.boards[games] = 0
+        self.score[games] = 0
+        self.pieces_placed[games] = 0
+        self.game_over[games] = False
+        self.bag_index[games] = len(self.pieces)
+        self.next_piece[games] = self._deal(games)
+        self._spawn(games)
+
+    def step(self, actions):
+        """Applies one action to each game.
+        actions: int array with one action (NOOP, LEFT, ...) per game.
+        Returns (lines, locked): how many lines each game cleared this step, and which games locked a piece.
+        """
+        actions = np.where(self.game_over, NOOP, np.asarray(actions))
+        lines = np.zeros(self.count, dtype=np.int64)
+        locked = np.zeros(self.count, dtype=bool)
+        if self.ring is not None:
+            record = self.ring.claim(self.lane)
+            record["board"][...] = self.boards
+
+        for action, col_step in ((LEFT, -1), (RIGHT, 1)):
+            games = np.flatnonzero(actions == action)
+            if len(games):
+                moved = ~self._collides(games, self.piece_type[games], self.rotation[games], self.row[games],
+                                        self.col[games] + col_step)
+                self.col[games[moved]] += col_step
+
+        for action, direction in ((CW, 0), (CCW, 1)):
+            games = np.flatnonzero(actions == action)
+            if len(games):
+                self._rotate(games, direction)
+
+        games = np.flatnonzero(actions == DOWN)
+        if len(games):
+            blocked = self._collides(games, self.piece_type[games], self.rotation[games], self.row[games] + 1,
+                                     self.col[games])
+            self.row[games[~blocked]] += 1
+            locked[games[blocked]] = True
+
+        games = np.flatnonzero(actions == HARD_DROP)
+        if len(games):
+            self.row[games] += self._drop_distance(games)
+            locked[games] = True
+
+        games = np.flatnonzero(locked)
+        if len(games):
+            lines[games] = self._lock(games)
+        if self.ring is not None:
+            record["action"][...] = actions
+            record["reward"][...] = lines
+            self.ring.publish(self.lane)
+        return lines, locked
+
+    def drop_distance(self):
+        """Returns how many rows each game's live piece can fall before it lands."""
+        return self._drop_distance(np.arange(self.count))
+
+    def _indices(self, games):
+        """Returns games, a bool mask or index array, as an index array."""
+        games = np.asarray(games)
+        return np.flatnonzero(games) if games.dtype == bool else games
+
+    def _deal(self, games):
+        """Returns the next piece for each of the games."""
+        if self.randomizer == "uniform":
+            return self.rng.integers(len(self.pieces), size=len(games))
+        # Shuffle a new bag for each game that has used up its last one.
+        piece_count = len(self.pieces)
+        empty = games[self.bag_index[games] == piece_count]
+        if len(empty):
+            self.bags[empty] = np.argsort(self.rng.random((len(empty), piece_count)), axis=1)
+            self.bag_index[empty] = 0
+        dealt = self.bags[games, self.bag_index[games]]
+        self.bag_index[games] += 1
+        return dealt
+
+    def _spawn(self, games):
+        """Spawns each game's next_piece, deals it a new one, and checks whether the game is lost."""
+        piece_type = self.next_piece[games]
+        self.piece_type[games] = piece_type
+        self.rotation[games] = 0
+        self.row[games] = self.spawn_rows[piece_type]
+        self.col[games] = (self.cols - self.box_sizes[piece_type]) // 2
+        self.next_piece[games] = self._deal(games)
+        lost = (self._collides(games, piece_type, self.rotation[games], self.row[games], self.col[games])
+                | self.boards[games, :2].any(axis=(1, 2)))
+        self.game_over[games[lost]] = True
+
+    def _cell_positions(self, piece_type, rotation, row, col):
+        """Returns the rows and cols of the cells covered by each pose, as two (games, size) arrays."""
+        offsets = self.cells[piece_type, rotation]
+        return row[:, None] + offsets[:, :, 0], col[:, None] + offsets[:, :, 1]
+
+    def _collides(self, games, piece_type, rotation, row, col):
+        """Returns a bool array of whether each game's piece, in the given pose, would be off the board or overlap a
+        dead piece.
+        """
+        rows, cols = self._cell_positions(piece_type, rotation, row, col)
+        outside = (rows < 0) | (rows >= self.rows) | (cols < 0) | (cols >= self.cols)
+        filled = self.boards[games[:, None], np.clip(rows, 0, self.rows - 1), np.clip(cols, 0, self.cols - 1)]
+        return (outside | (filled != 0)).any(axis=1)
+
+    def _rotate(self, games, direction):
+        """Rotates each game's piece, trying each wall kick in order and keeping the first that fits.
+        direction: 0 for clockwise, 1 for counterclockwise.
+        """
+        piece_type, rotation = self.piece_type[games], self.rotation[games]
+        new_rotation = (rotation + (1 if direction == 0 else -1)) % 4
+        kicks = self.kicks[piece_type, rotation, direction]
+        pending = np.ones(len(games), dtype=bool)
+        for kick in range(kicks.shape[1]):
+            trying = np.flatnonzero(pending)
+            if not len(trying):
+                break
+            row = self.row[games[trying]] + kicks[trying, kick, 0]
+            col = self.col[games[trying]] + kicks[trying, kick, 1]
+            fits = ~self._collides(games[trying], piece_type[trying], new_rotation[trying], row, col)
+            rotated = games[trying[fits]]
+            self.rotation[rotated] = new_rotation[trying[fits]]
+            self.row[rotated] = row[fits]
+            self.col[rotated] = col[fits]
+            pending[trying[fits]] = False
+
+    def _drop_distance(self, games):
+        """Returns how many rows each game's piece can fall, by testing every distance at once."""
+        rows, cols = self._cell_positions(self.piece_type[games], self.rotation[games], self.row[games],
+                                          self.col[games])
+        steps = np.arange(1, self.rows + 1)[None, :, None]
+        rows = rows[:, None, :] + steps      # (games, distance, size)
+        cols = np.broadcast_to(cols[:, None, :], rows.shape)
+        filled = self.boards[games[:, None, None], np.clip(rows, 0, self.rows - 1), cols] != 0
+        blocked = (filled | (rows >= self.rows)).any(axis=2)
+        return blocked.argmax(axis=1)   # The first blocked distance is one more than the distance it can fall.
+
+    def _lock(self, games):
+        """Locks each game's piece into its board, clears full rows and spawns the next piece.
+        Returns the number of lines each game cleared.
+        """
+        rows, cols = self._cell_positions(self.piece_type[games], self.rotation[games], self.row[games],
+                                          self.col[games])
+        self.boards[games[:, None], rows, cols] = 1
+        self.pieces_placed[games] += 1
+
+        # Clear full rows by moving them to the top of the board, in one stable sort per board, then emptying them.
+        full = self.boards[games].all(axis=2)
+        lines = full.sum(axis=1)
+        clearing = np.flatnonzero(lines)
+        if len(clearing):
+            cleared_games = games[clearing]
+            order = np.argsort(~full[clearing], axis=1, kind="stable")
+            boards = np.take_along_axis(self.boards[cleared_games], order[:, :, None], axis=1)
+            boards[np.arange(self.rows)[None, :] < lines[clearing, None]] = 0
+            self.boards[cleared_games] = boards
+            self.score[cleared_games] += lines[clearing]
+
+        self._spawn(games)
+        return lines
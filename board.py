@@ -0,0 +1,470 @@
+"""Board backends for the engine.
+A board only stores dead pieces; the engine keeps track of the live piece itself and asks the board whether a set of
+cells is free.  Cells are (row, col) tuples, with row 0 at the top.
+Two interchangeable backends are provided:
+ArrayBoard: a rows x cols numpy array, where 1 marks a dead cell and 0 an empty one.
+BitBoard: a list of integer row masks, where bit col of row marks a dead cell.  Collision is a bitwise AND, and a full
+row is an equality check against the full-row mask.
+Both keep per-row fill counts and per-column heights up to date as pieces are placed and rows are cleared, so line
+detection, drop distances and AI features don't need to scan the board.
+Boards are kept small so that many of them can be held in memory at once: cells are stored as uint8 (or bits), the
+classes use __slots__, and nbytes() reports what a board costs.  For bulk storage, pack() squeezes a board down to one
+bit per cell, and unpack_board() turns that back into a live board.
+"""
+
+import sys
+import numpy as np
+import zobrist
+
+
+def create_grid(dimensions):
+    """Returns an empty array of the specified dimensions.
+    dimensions: a tuple. (rows, cols)
+    """
+    return np.zeros(dimensions, dtype=np.uint8)
+
+
+class Board:
+    """Bookkeeping shared by the board backends.
+    row_counts[row] is the number of dead cells in that row.
+    heights[col] is the number of rows from the bottom of the board up to and including the column's topmost dead cell
+    (0 if the column is empty).
+    cell_count is the total number of dead cells.
+    version goes up by 1 every time the board's contents change, so callers can cache anything derived from them.
+    hash is a 64-bit hash of the board's contents, updated incrementally (see zobrist.py).
+    Backends implement collides_shape, any_in_rows, to_array, _fingerprint, _cells_snapshot, _restore_cells, _fill,
+    _unfill, _delete_rows, _insert_full_rows, _push_rows, _drop_rows and _column_height.  The last five only need
+    to look at rows from their top (or start) argument down; nothing they need is above it.  The hash is taken out of
+    rows before the backend changes them and put back after, so _fingerprint must always describe the row as it is.
+    dimensions: a tuple. (rows, cols)
+    """
+
+    __slots__ = ("rows", "cols", "row_counts", "heights", "cell_count", "version", "hash", "_row_keys", "_column_keys")
+
+    def __init__(self, dimensions):
+        self.rows, self.cols = dimensions
+        self.row_counts = [0] * self.rows
+        self.heights = [0] * self.cols
+        self.cell_count = 0
+        self.version = 0
+        self.hash = 0
+        self._row_keys = zobrist.row_keys(self.rows)
+        self._column_keys = zobrist.column_keys(self.cols)
+
+    def place(self, cells):
+        """Marks the cells as dead."""
+        row_counts, heights = self.row_counts, self.heights
+        touched_rows = {row for row, col in cells}
+        self._hash_rows(touched_rows)   # XOR out the touched rows' old keys.
+        self._fill(cells)
+        for row, col in cells:
+            row_counts[row] += 1
+            if heights[col] < self.rows - row:
+                heights[col] = self.rows - row
+        self._hash_rows(touched_rows)   # XOR in their new keys.
+        self.cell_count += len(cells)
+        self.version += 1
+
+    def remove(self, cells):
+        """Marks the cells as empty again.  This undoes place()."""
+        row_counts, heights = self.row_counts, self.heights
+        touched_rows = {row for row, col in cells}
+        self._hash_rows(touched_rows)
+        self._unfill(cells)
+        for row, col in cells:
+            row_counts[row] -= 1
+        self._hash_rows(touched_rows)
+        for row, col in cells:
+            if heights[col] == self.rows - row:     # If this was the column's topmost cell...
+                heights[col] = self._column_height(col, row)
+        self.cell_count -= len(cells)
+        self.version += 1
+
+    def full_rows(self, rows_to_check=None):
+        """Returns a sorted list of indices for the rows that are completely filled.
+        rows_to_check: the rows that could have been filled, eg the rows a piece was just placed in.  None checks every
+        row.
+        """
+        if rows_to_check is None:
+            rows_to_check = range(self.rows)
+        return sorted({row for row in rows_to_check if self.row_counts[row] == self.cols})
+
+    def clear_rows(self, rows_to_clear):
+        """Deletes the rows, descending the rows above them.  However many rows are cleared, the surviving rows are
+        compacted in a single pass and the top is refilled with empty rows.
+        Only the rows from the top of the stack down to the lowest cleared row move, so the cost doesn't grow with the
+        empty space above the stack or the settled rows below the clear.
+        rows_to_clear: a sorted list of row indices.  These must be exactly the full rows.
+        """
+        if not rows_to_clear:
+            return
+        top, bottom = self.rows - max(self.heights), rows_to_clear[-1] + 1
+        self._hash_rows(range(top, bottom))     # Only these rows move or disappear, so only their keys change.
+        self._delete_rows(rows_to_clear, top)
+        self.row_counts[top:bottom] = ([0] * len(rows_to_clear)
+                                       + [count for count in self.row_counts[top:bottom] if count != self.cols])
+        self._hash_rows(range(top, bottom))
+
+        self.cell_count -= self.cols * len(rows_to_clear)
+        self.version += 1
+
+        # Every column has a cell in each cleared row, so no column's top is below the highest cleared row.  Columns
+        # whose top was above it just drop by the number of cleared rows; the rest need their new top found.
+        top_cleared_height = self.rows - rows_to_clear[0]
+        for col, height in enumerate(self.heights):
+            if height > top_cleared_height:
+                self.heights[col] = height - len(rows_to_clear)
+            else:
+                self.heights[col] = self._column_height(col, rows_to_clear[0])
+
+    def unclear_rows(self, cleared_rows):
+        """Puts back full rows that clear_rows() deleted, lifting the rows above them.  This undoes clear_rows().
+        cleared_rows: the same sorted list of row indices that was passed to clear_rows().
+        """
+        if not cleared_rows:
+            return
+        # Before the clear, the stack's top was no lower than the highest cleared row, and no lower than the current
+        # top lifted by the number of cleared rows.  Rows from there down to the lowest cleared row move back.
+        top = min(cleared_rows[0], self.rows - max(self.heights) - len(cleared_rows))
+        bottom = cleared_rows[-1] + 1
+        self._hash_rows(range(top, bottom))
+        self._insert_full_rows(cleared_rows, top)
+        self.row_counts[top:bottom] = self._lift_rows(self.row_counts, cleared_rows, top, self.cols)
+        self._hash_rows(range(top, bottom))
+
+        self.cell_count += self.cols * len(cleared_rows)
+        self.version += 1
+
+        # Columns whose top was above the highest cleared row rise by the number of cleared rows.  Every other column
+        # now has its top in the highest cleared row.
+        top_cleared_height = self.rows - cleared_rows[0]
+        self.heights = [max(height + len(cleared_rows), top_cleared_height) for height in self.heights]
+
+    def insert_garbage(self, holes):
+        """Pushes garbage rows in from the bottom of the board, lifting every row above them.  Each garbage row is full
+        except for its hole.  However many rows are pushed, the stack is lifted in a single pass, as in clear_rows().
+        holes: the hole column of each garbage row, from the top garbage row down.
+        Returns False, and changes nothing, if the garbage would push dead cells off the top of the board.
+        """
+        if not holes:
+            return True
+        if not all(0 <= hole < self.cols for hole in holes):
+            raise ValueError("holes must be columns of the board.")
+        count = len(holes)
+        stack_height = max(self.heights)
+        if stack_height + count > self.rows:
+            return False
+        top = self.rows - stack_height
+        self._hash_rows(range(top, self.rows))  # Every row of the stack moves.
+        self._push_rows(holes, top)
+        self.row_counts[top - count:] = self.row_counts[top:] + [self.cols - 1] * count
+        self._hash_rows(range(top - count, self.rows))
+
+        self.cell_count += (self.cols - 1) * count
+        self.version += 1
+
+        # Columns that had cells rise by the number of garbage rows.  The rest now have their top in the highest
+        # garbage row that isn't holed in that column.
+        for col, height in enumerate(self.heights):
+            if height:
+                self.heights[col] = height + count
+            else:
+                self.heights[col] = next((count - index for index, hole in enumerate(holes) if hole != col), 0)
+        return True
+
+    def remove_garbage(self, count):
+        """Deletes the bottom count rows, descending every row above them.  This undoes insert_garbage()."""
+        if not count:
+            return
+        top = min(self.rows - max(self.heights), self.rows - count)
+        self._hash_rows(range(top, self.rows))
+        self._drop_rows(count, top)
+        self.cell_count -= sum(self.row_counts[self.rows - count:])
+        self.row_counts[top:] = [0] * count + self.row_counts[top:self.rows - count]
+        self._hash_rows(range(top, self.rows))
+        self.version += 1
+
+        # Columns whose top was above the removed rows drop with the stack; the rest are now empty.
+        self.heights = [height - count if height > count else 0 for height in self.heights]
+
+    @staticmethod
+    def _lift_rows(values, cleared_rows, top, full_value):
+        """Returns values[top:bottom] as it was before cleared_rows were cleared, where bottom is the row below the
+        lowest cleared row and each cleared row held full_value.
+        """
+        cleared = set(cleared_rows)
+        surviving_values = iter(values[top + len(cleared_rows):cleared_rows[-1] + 1])
+        return [full_value if row in cleared else next(surviving_values) for row in range(top, cleared_rows[-1] + 1)]
+
+    def _hash_rows(self, rows_to_hash):
+        """XORs the keys of the non-empty rows among rows_to_hash into hash."""
+        row_counts, fingerprint, keys = self.row_counts, self._fingerprint, self._row_keys
+        for row in rows_to_hash:
+            if row_counts[row]:
+                self.hash ^= zobrist.row_key(keys[row], fingerprint(row))
+
+    def holes(self):
+        """Returns the number of empty cells that have a dead cell somewhere above them in the same column."""
+        return sum(self.heights) - self.cell_count
+
+    def nbytes(self):
+        """Returns the number of bytes of memory this board holds, including its bookkeeping.
+        Small ints are shared by the interpreter, so only the lists holding them are counted.  The zobrist key
+        tables are shared by every board of the same size, so they aren't counted either.
+        """
+        return (sys.getsizeof(self) + sys.getsizeof(self.row_counts) + sys.getsizeof(self.heights)
+                + sys.getsizeof(self.hash))
+
+    def pack(self):
+        """Returns the board's cells packed into bytes, one bit per cell, with each row padded to a whole byte.
+        Bit col % 8 of byte col // 8 in a row's bytes is that row's cell col.
+        """
+        return np.packbits(self.to_array(), axis=1, bitorder="little").tobytes()
+
+    def snapshot(self):
+        """Returns an immutable copy of the board's contents and bookkeeping, for restore()."""
+        return self._cells_snapshot(), tuple(self.row_counts), tuple(self.heights), self.cell_count, self.hash
+
+    def restore(self, snapshot):
+        """Puts the board back to the state captured by snapshot().
+        version moves on rather than back, since the contents changed.
+        """
+        cells, row_counts, heights, self.cell_count, self.hash = snapshot
+        self._restore_cells(cells)
+        self.row_counts = list(row_counts)
+        self.heights = list(heights)
+        self.version += 1
+
+
+class ArrayBoard(Board):
+    """Board backed by a uint8 numpy array.
+    row_fingerprints[row] is that row's contents fingerprint (see zobrist.py), kept in a uint64 array that moves along
+    with the grid.
+    dimensions: a tuple. (rows, cols)
+    """
+
+    __slots__ = ("grid", "row_fingerprints")
+
+    def __init__(self, dimensions):
+        super().__init__(dimensions)
+        self.grid = create_grid(dimensions)
+        self.row_fingerprints = np.zeros(self.rows, dtype=np.uint64)
+
+    def collides_shape(self, shape, row, col):
+        """Returns True if a piece's rotation state, with its box's top left corner at (row, col), would be off the
+        board or overlap a dead piece.
+        shape: a pieces.Shape.
+        """
+        if (row + shape.top < 0 or row + shape.bottom >= self.rows
+                or col + shape.left < 0 or col + shape.right >= self.cols):
+            return True
+        grid = self.grid
+        for cell_row, cell_col in shape.cells:
+            if grid[row + cell_row, col + cell_col]:
+                return True
+        return False
+
+    def any_in_rows(self, start, stop):
+        """Returns True if any row in range(start, stop) holds a dead piece."""
+        return any(self.row_counts[start:stop])
+
+    def to_array(self):
+        """Returns a copy of the board as an array of 0s and 1s."""
+        return self.grid.copy()
+
+    def nbytes(self):
+        """Returns the number of bytes of memory this board holds, including its bookkeeping."""
+        return super().nbytes() + sys.getsizeof(self.grid) + sys.getsizeof(self.row_fingerprints)
+
+    def _fingerprint(self, row):
+        return int(self.row_fingerprints[row])
+
+    def _full_fingerprint(self):
+        """Returns the fingerprint of a full row."""
+        full_fingerprint = 0
+        for key in self._column_keys:
+            full_fingerprint ^= key
+        return full_fingerprint
+
+    def _cells_snapshot(self):
+        cells = (self.grid.copy(), self.row_fingerprints.copy())
+        for array in cells:
+            array.flags.writeable = False
+        return cells
+
+    def _restore_cells(self, cells):
+        self.grid[...], self.row_fingerprints[...] = cells
+
+    def _fill(self, cells):
+        fingerprints, keys = self.row_fingerprints, self._column_keys
+        for row, col in cells:
+            self.grid[row, col] = 1
+            fingerprints[row] ^= np.uint64(keys[col])
+
+    def _unfill(self, cells):
+        fingerprints, keys = self.row_fingerprints, self._column_keys
+        for row, col in cells:
+            self.grid[row, col] = 0
+            fingerprints[row] ^= np.uint64(keys[col])
+
+    def _delete_rows(self, rows_to_clear, top):
+        keep = np.ones(self.rows, dtype=bool)
+        keep[rows_to_clear] = False
+        bottom = rows_to_clear[-1] + 1
+        for array in (self.grid, self.row_fingerprints):
+            array[top + len(rows_to_clear):bottom] = array[top:bottom][keep[top:bottom]]
+            array[top:top + len(rows_to_clear)] = 0
+
+    def _insert_full_rows(self, cleared_rows, top):
+        keep = np.ones(self.rows, dtype=bool)
+        keep[cleared_rows] = False
+        bottom = cleared_rows[-1] + 1
+        for array in (self.grid, self.row_fingerprints):
+            array[top:bottom][keep[top:bottom]] = array[top + len(cleared_rows):bottom].copy()
+        self.grid[cleared_rows] = 1
+        self.row_fingerprints[cleared_rows] = self._full_fingerprint()
+
+    def _push_rows(self, holes, top):
+        count = len(holes)
+        for array in (self.grid, self.row_fingerprints):
+            array[top - count:self.rows - count] = array[top:]
+        self.grid[self.rows - count:] = 1
+        self.grid[np.arange(self.rows - count, self.rows), holes] = 0
+        full_fingerprint = self._full_fingerprint()
+        self.row_fingerprints[self.rows - count:] = [full_fingerprint ^ self._column_keys[hole] for hole in holes]
+
+    def _drop_rows(self, count, top):
+        for array in (self.grid, self.row_fingerprints):
+            array[top + count:] = array[top:self.rows - count].copy()
+            array[top:top + count] = 0
+
+    def _column_height(self, col, start):
+        filled_rows = np.flatnonzero(self.grid[start:, col])
+        return self.rows - start - int(filled_rows[0]) if len(filled_rows) else 0
+
+
+class BitBoard(Board):
+    """Board backed by one integer bitmask per row.
+    dimensions: a tuple. (rows, cols)
+    """
+
+    __slots__ = ("full_mask", "masks")
+
+    def __init__(self, dimensions):
+        super().__init__(dimensions)
+        self.full_mask = (1 << self.cols) - 1
+        self.masks = [0] * self.rows
+
+    def collides_shape(self, shape, row, col):
+        """Returns True if a piece's rotation state, with its box's top left corner at (row, col), would be off the
+        board or overlap a dead piece.  Each of the state's rows is a single AND against the board's row mask.
+        shape: a pieces.Shape.
+        """
+        if (row + shape.top < 0 or row + shape.bottom >= self.rows
+                or col + shape.left < 0 or col + shape.right >= self.cols):
+            return True
+        masks = self.masks
+        if col >= 0:
+            for mask_row, mask in shape.row_masks:
+                if masks[row + mask_row] & (mask << col):
+                    return True
+        else:
+            for mask_row, mask in shape.row_masks:
+                if masks[row + mask_row] & (mask >> -col):
+                    return True
+        return False
+
+    def any_in_rows(self, start, stop):
+        """Returns True if any row in range(start, stop) holds a dead piece."""
+        return any(self.masks[start:stop])
+
+    def to_array(self):
+        """Returns a copy of the board as an array of 0s and 1s."""
+        grid = create_grid((self.rows, self.cols))
+        for row, mask in enumerate(self.masks):
+            for col in range(self.cols):
+                grid[row, col] = (mask >> col) & 1
+        return grid
+
+    def nbytes(self):
+        """Returns the number of bytes of memory this board holds, including its bookkeeping."""
+        # Masks above 256 are ints of their own rather than shared small ints.
+        return (super().nbytes() + sys.getsizeof(self.masks) + sys.getsizeof(self.full_mask)
+                + sum(sys.getsizeof(mask) for mask in self.masks if mask > 256))
+
+    def pack(self):
+        """Returns the board's cells packed into bytes, one bit per cell, with each row padded to a whole byte.
+        Bit col % 8 of byte col // 8 in a row's bytes is that row's cell col.
+        """
+        row_bytes = (self.cols + 7) // 8
+        return b"".join(mask.to_bytes(row_bytes, "little") for mask in self.masks)
+
+    def _fingerprint(self, row):
+        # A row's mask is its fingerprint, as long as the board is at most 64 columns wide.
+        mask = self.masks[row]
+        return mask if mask <= zobrist.MASK_64 else zobrist.mask_fingerprint(mask, self._column_keys)
+
+    def _cells_snapshot(self):
+        return tuple(self.masks)
+
+    def _restore_cells(self, cells):
+        self.masks = list(cells)
+
+    def _fill(self, cells):
+        for row, col in cells:
+            self.masks[row] |= 1 << col
+
+    def _unfill(self, cells):
+        for row, col in cells:
+            self.masks[row] &= ~(1 << col)
+
+    def _delete_rows(self, rows_to_clear, top):
+        full_mask = self.full_mask
+        bottom = rows_to_clear[-1] + 1
+        self.masks[top:bottom] = [0] * len(rows_to_clear) + [mask for mask in self.masks[top:bottom] if mask != full_mask]
+
+    def _insert_full_rows(self, cleared_rows, top):
+        self.masks[top:cleared_rows[-1] + 1] = self._lift_rows(self.masks, cleared_rows, top, self.full_mask)
+
+    def _push_rows(self, holes, top):
+        self.masks[top - len(holes):] = self.masks[top:] + [self.full_mask ^ (1 << hole) for hole in holes]
+
+    def _drop_rows(self, count, top):
+        self.masks[top:] = [0] * count + self.masks[top:self.rows - count]
+
+    def _column_height(self, col, start):
+        bit = 1 << col
+        masks = self.masks
+        for row in range(start, self.rows):
+            if masks[row] & bit:
+                return self.rows - row
+        return 0
+
+
+# Board backends, by the name GameEngine accepts.
+boards = {"array": ArrayBoard,
+          "bitboard": BitBoard}
+
+
+def create_board(kind, dimensions):
+    """Returns a new, empty board.
+    kind: "array" or "bitboard"
+    dimensions: a tuple. (rows, cols)
+    """
+    if kind not in boards:
+        raise ValueError("kind must be one of " + ", ".join(repr(name) for name in boards) + ".")
+    return boards[kind](dimensions)
+
+
+def unpack_board(data, dimensions, kind="array"):
+    """Returns a new board holding the cells packed by Board.pack().
+    data: the packed bytes.
+    dimensions: a tuple. (rows, cols)
+    kind: "array" or "bitboard"
+    """
+    rows, cols = dimensions
+    packed = np.frombuffer(data, dtype=np.uint8).reshape(rows, (cols + 7) // 8)
+    grid = np.unpackbits(packed, axis=1, count=cols, bitorder="little")
+    board = create_board(kind, dimensions)
+    board.place([(int(row), int(col)) for row, col in np.argwhere(grid)])
+    return board
@@ -0,0 +1,586 @@
+"""Headless Tetris engine.
+Holds the same game rules as main.py, but keeps all of its state (board, live piece, score, piece queue) on a
+GameEngine object instead of in module globals, and never touches tkinter.  Renderers read the engine's state after
+each call.
+Renderers and other observers can subscribe() to the events the engine emits as the game changes (see events.py).
+Time only passes when tick() is called, and it passes in fixed frames (see gravity.py), so a headless game runs as fast
+as it can be computed while a GUI can feed it real time.
+The board (see board.py) only holds dead pieces.  The live piece is stored as a pose, (piece_type, rotation, row, col):
+the index of the piece in the engine's PieceSet, which of its 4 rotation states it is in, and the board position of the
+top left corner of its bounding box.  Pieces, rotations and kicks all come from the tables precomputed in pieces.py.
+"""
+
+import functools
+from collections import namedtuple
+import zobrist
+import gravity
+import events
+from board import create_board
+from history import History
+from randomizer import create_randomizer
+from pieces import tetrominoes
+from search import Placement, PlacementFinder
+
+
+# An immutable copy of everything a game's future depends on; see GameEngine.snapshot().
+# pose_hash and queue_hash are carried along so that restoring doesn't have to rehash anything.
+# hold is (held_piece, can_hold).
+# timers holds the engine's frame clock, gravity and lock delay state.
+# mode is the mode_state of game modes that add state of their own.
+Snapshot = namedtuple("Snapshot", ["board", "pose", "queue", "randomizer_state", "score", "game_over", "pose_hash",
+                                   "queue_hash", "hold", "timers", "mode"])
+
+
+def recorded(action):
+    """Decorator for GameEngine actions.  If the engine keeps a history, each outermost call is recorded in it as one
+    move.
+    """
+    @functools.wraps(action)
+    def recorded_action(self, *args):
+        if self.history is None or self._recording:
+            return action(self, *args)
+        before = (self._pose, self._queue, self.randomizer.getstate(), self.score, self.game_over, self.hold,
+                  self.mode_state)
+        self.last_lock = None
+        self.last_garbage = ()
+        self._recording = True
+        try:
+            return action(self, *args)
+        finally:
+            self._recording = False
+            self.history.record(self, before)
+    return recorded_action
+
+
+class GameEngine:
+    """A single game of Tetris with no rendering attached.
+    dimensions: a tuple. (rows, cols), including the 2 buffer rows at the top.
+    seed: seed for this game's randomizer.  None seeds from the OS.
+    board: which board backend to use.  "array" or "bitboard"; see board.py.
+    history_size: how many moves undo() can take back (see history.py).  0 keeps no history.
+    pieces: the pieces.PieceSet to play with.  None plays with pieces.tetrominoes.
+    placement_cache_size: how many placements() results to remember (see search.py).
+    level: the starting level, which sets how fast tick() makes pieces fall (see gravity.py).  The level goes up by 1
+    for every 10 lines cleared.
+    lock_delay: how many frames a piece can rest on the stack during tick() before it locks.
+    max_lock_resets: how many times per piece shifting or rotating a resting piece restarts its lock delay.
+    randomizer: how pieces are dealt.  "uniform", "bag" or "history"; see randomizer.py.
+    queue_size: how many upcoming pieces can be previewed.
+    Once game_over is set, every action returns straight away without changing anything.
+    """
+
+    def __init__(self, dimensions=(22, 10), seed=None, board="array", history_size=0, pieces=None,
+                 placement_cache_size=4096, level=1, lock_delay=30, max_lock_resets=15, randomizer="uniform",
+                 queue_size=1):
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1.")
+        self.pieces = tetrominoes if pieces is None else pieces
+        self._shapes = self.pieces.shapes
+        self.randomizer = create_randomizer(randomizer, len(self.pieces), seed)
+        self.board = create_board(board, dimensions)
+        self._pose_hash = 0
+        self._queue_hash = 0
+        self.pose = None    # (piece_type, rotation, row, col) of the live piece, or None if there is no live piece.
+        self.score = 0
+        self.game_over = False
+        self.queue = tuple(self.randomizer.next() for slot in range(queue_size))
+        self.hold = (None, True)
+        self._ghost_poses = {}   # Landing pose of each pose queried since the board last changed.
+        self._ghost_version = None  # Board version that _ghost_poses was computed for.
+        self.history = History(history_size) if history_size else None
+        self.last_lock = None   # (cells, cleared rows) of the last piece to lock.
+        self.last_garbage = ()  # Holes of the garbage rows added by the current move, from the top row down.
+        self._recording = False
+        self.placement_finder = PlacementFinder(self.pieces, placement_cache_size)
+        self.start_level = level
+        self.lock_delay = lock_delay
+        self.max_lock_resets = max_lock_resets
+        self.frame = 0      # Number of frames played.
+        self._time_debt = 0.0   # Seconds passed to tick() that haven't made up a whole frame yet.
+        self._gravity_progress = 0  # Subrows the live piece has fallen since it last fell a whole row.
+        self._lock_frames = 0   # Frames the live piece has rested on the stack.
+        self._lock_resets = 0   # Times the live piece's lock delay has been restarted.
+        self.subscribers = []   # Callbacks that each event is passed to; see subscribe().
+
+    @property
+    def pose(self):
+        """(piece_type, rotation, row, col) of the live piece, or None if there is no live piece."""
+        return self._pose
+
+    @pose.setter
+    def pose(self, pose):
+        self._pose = pose
+        self._pose_hash = zobrist.pose_key(pose)
+
+    @property
+    def queue(self):
+        """Tuple of the upcoming pieces, as indices into pieces, in the order they will spawn."""
+        return self._queue
+
+    @queue.setter
+    def queue(self, queue):
+        self._queue = queue
+        queue_hash = 0
+        for slot, piece_type in enumerate(queue):
+            queue_hash ^= zobrist.queue_key(slot, piece_type)
+        self._queue_hash = queue_hash
+
+    @property
+    def hold(self):
+        """(held_piece, can_hold): the piece in the hold slot, or None, and whether the live piece may be held.  Only one
+        hold is allowed per piece.
+        """
+        return self._hold
+
+    @hold.setter
+    def hold(self, hold):
+        self._hold = hold
+        self._hold_hash = zobrist.hold_key(*hold)
+
+    @property
+    def mode_state(self):
+        """An immutable copy of any state a game mode adds to the game, so that snapshots and the undo history cover
+        it too.  Plain games have none.
+        """
+        return None
+
+    @mode_state.setter
+    def mode_state(self, state):
+        pass
+
+    @property
+    def next_piece(self):
+        """Index into pieces of the piece that will spawn next."""
+        return self._queue[0]
+
+    @property
+    def hash(self):
+        """64-bit hash of the board contents, live piece, piece queue and hold slot.
+        Each part is kept up to date as it changes, so reading this never rehashes the game.
+        """
+        return self.board.hash ^ self._pose_hash ^ self._queue_hash ^ self._hold_hash
+
+    @property
+    def level(self):
+        """The current level: the starting level plus 1 for every 10 lines cleared."""
+        return self.start_level + self.score // 10
+
+    @property
+    def piece(self):
+        """Cells of the live piece, as a list of (row, col) tuples."""
+        if self.pose is None:
+            return []
+        return self.cells(*self.pose)
+
+    @property
+    def grid(self):
+        """The board as an array of 0s (empty), 1s (dead piece) and 2s (live piece), for rendering."""
+        grid = self.board.to_array()
+        for row, col in self.piece:
+            grid[row, col] = 2
+        return grid
+
+    @property
+    def ghost(self):
+        """Cells where the live piece would land if hard dropped, as a list of (row, col) tuples."""
+        if self.pose is None:
+            return []
+        return self.cells(*self.ghost_pose())
+
+    def ghost_pose(self, pose=None):
+        """Returns the pose a piece would land in if hard dropped.
+        pose: the piece's pose.  None uses the live piece.
+        Results are cached per pose until the board changes, so repeated queries between moves are free.
+        """
+        if pose is None:
+            pose = self.pose
+        if self._ghost_version != self.board.version:
+            self._ghost_poses = {}
+            self._ghost_version = self.board.version
+        ghost_pose = self._ghost_poses.get(pose)
+        if ghost_pose is None:
+            piece_type, rotation, row, col = pose
+            ghost_pose = (piece_type, rotation, row + self.drop_distance(pose), col)
+            self._ghost_poses[pose] = ghost_pose
+        return ghost_pose
+
+    def placements(self, piece_type=None, hold=False):
+        """Returns every distinct position a piece can lock in on the current board, as a tuple of search.Placements.
+        piece_type: the piece to place, starting from its spawn pose.  None places the live piece from where it is.
+        hold: if True, places the piece that hold_piece() would swap in instead, and starts each path with "hold".
+        Returns an empty tuple if the live piece can't be held.
+        """
+        if hold:
+            held_piece, can_hold = self._hold
+            if self.pose is None or not can_hold:
+                return ()
+            placements = self.placements(self.next_piece if held_piece is None else held_piece)
+            return tuple(Placement(placement.pose, ("hold",) + placement.path) for placement in placements)
+        if piece_type is None:
+            if self.pose is None:
+                return ()
+            return self.placement_finder.find(self.board, self.pose[0], self.pose)
+        return self.placement_finder.find(self.board, piece_type)
+
+    def subscribe(self, callback):
+        """Calls callback(event) with every event the engine emits from now on (see events.py).  Returns callback."""
+        self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        """Stops passing events to a callback given to subscribe()."""
+        self.subscribers.remove(callback)
+
+    def _emit(self, event):
+        """Passes an event to every subscriber.  Callers check that there are subscribers before creating the event."""
+        for callback in self.subscribers:
+            callback(event)
+
+    def snapshot(self):
+        """Returns a Snapshot of the game, which restore() can later return it to."""
+        return Snapshot(self.board.snapshot(), self._pose, self._queue, self.randomizer.getstate(), self.score,
+                        self.game_over, self._pose_hash, self._queue_hash, self._hold,
+                        (self.frame, self._time_debt, self._gravity_progress, self._lock_frames, self._lock_resets),
+                        self.mode_state)
+
+    def restore(self, snapshot):
+        """Returns the game to the state captured by snapshot()."""
+        self.board.restore(snapshot.board)
+        self.randomizer.setstate(snapshot.randomizer_state)
+        self._pose = snapshot.pose
+        self._queue = snapshot.queue
+        self.score = snapshot.score
+        self.game_over = snapshot.game_over
+        self._pose_hash = snapshot.pose_hash
+        self._queue_hash = snapshot.queue_hash
+        self.hold = snapshot.hold
+        self.mode_state = snapshot.mode
+        self.frame, self._time_debt, self._gravity_progress, self._lock_frames, self._lock_resets = snapshot.timers
+        if self.history is not None:
+            self.history.clear()    # The recorded moves don't lead to or from the restored state.
+        if self.subscribers:
+            self._emit(events.Restore())
+
+    def undo(self):
+        """Takes back the last move.  Returns False if there was nothing to undo.
+        The live piece's gravity and lock delay start over.
+        """
+        if self.history is None or not self.history.undo(self):
+            return False
+        self._reset_timers()
+        if self.subscribers:
+            self._emit(events.Restore())
+        return True
+
+    def redo(self):
+        """Makes the last undone move again.  Returns False if there was nothing to redo.
+        The live piece's gravity and lock delay start over.
+        """
+        if self.history is None or not self.history.redo(self):
+            return False
+        self._reset_timers()
+        if self.subscribers:
+            self._emit(events.Restore())
+        return True
+
+    def board_nbytes(self):
+        """Returns the number of bytes of memory the engine's board holds."""
+        return self.board.nbytes()
+
+    def cells(self, piece_type, rotation, row, col):
+        """Returns the board cells covered by a piece in the given pose."""
+        return [(row + cell_row, col + cell_col) for cell_row, cell_col in self._shapes[piece_type][rotation].cells]
+
+    def fits(self, piece_type, rotation, row, col):
+        """Returns True if a piece in the given pose would be on the board and clear of dead pieces."""
+        return not self.board.collides_shape(self._shapes[piece_type][rotation], row, col)
+
+    @recorded
+    def create_piece(self):
+        """Spawns in next_piece, then deals a new piece onto the end of the queue.  The new piece may be held.
+        If the new piece doesn't fit, or if there are any dead pieces in the top 2 rows (ie the buffer rows), then the
+        game is over and game_over is set.
+        """
+        if self.game_over:
+            return
+        piece_type = self.next_piece
+        # Move the queue up and deal a new piece onto the end of it.  The hash follows the queue up, rather than
+        # being rehashed slot by slot.
+        new_piece = self.randomizer.next()
+        self._queue_hash = zobrist.advance_queue_hash(self._queue_hash, piece_type, new_piece, len(self._queue))
+        self._queue = self._queue[1:] + (new_piece,)
+
+        self._spawn(piece_type)
+        self.hold = (self._hold[0], True)
+
+    @recorded
+    def hold_piece(self):
+        """Puts the live piece in the hold slot and spawns the piece that was held in its place, or next_piece if the
+        slot was empty.  The piece that comes out can't be held again until it locks.
+        Returns True if the piece was held.
+        """
+        held_piece, can_hold = self._hold
+        if self.pose is None or not can_hold or self.game_over:
+            return False
+        piece_type = self.pose[0]
+        if held_piece is None:
+            self.create_piece()
+        else:
+            self._spawn(held_piece)
+        self.hold = (piece_type, False)
+        if self.subscribers:
+            self._emit(events.Hold(self._hold))
+        return True
+
+    def _spawn(self, piece_type):
+        """Makes a piece the live piece, in its spawn pose, and checks whether the game is lost."""
+        # Spawn the piece centered (rounding left) with its topmost cell in row 0.
+        self.pose = self.pieces.spawn_pose(piece_type, self.board.cols)
+
+        self._reset_timers()
+        if self.subscribers:
+            self._emit(events.Spawn(self._pose, self._queue))
+
+        # Check if the game is lost.
+        if not self.fits(*self.pose) or self.board.any_in_rows(0, 2):
+            self._top_out()
+
+    @recorded
+    def shift_piece(self, direction):
+        """Shifts the active piece 1 space to the left or right, if possible.
+        direction: "l" or "r"
+        Returns True if the piece moved.
+        """
+        if not isinstance(direction, str):
+            raise TypeError("direction must be a string.")
+        if direction == "l":
+            col_step = -1
+        elif direction == "r":
+            col_step = 1
+        else:
+            raise ValueError("direction must be either 'l' or 'r'.")
+        if self.game_over or not self._move_piece(0, col_step):
+            return False
+        self._reset_lock_delay()
+        return True
+
+    @recorded
+    def descend_piece(self):
+        """Descends the piece 1 space down.
+        If the piece can't descend, kills the piece, resolves any tetrises, and creates a new piece.
+        Returns True if the piece moved.
+        """
+        if self.pose is None or self.game_over:
+            return False
+        if self._move_piece(1, 0):
+            return True
+
+        self.lock_piece()
+        return False
+
+    @recorded
+    def hard_drop(self):
+        """Drops the piece straight down as far as it will go and kills it in a single step.
+        Returns the number of rows the piece fell.
+        """
+        if self.pose is None or self.game_over:
+            return 0
+        ghost_pose = self.ghost_pose()
+        distance = ghost_pose[2] - self.pose[2]
+        if distance and self.subscribers:
+            self._emit(events.Move(self._pose, ghost_pose))
+        self.pose = ghost_pose
+        self.lock_piece()
+        return distance
+
+    def tick(self, dt):
+        """Lets dt seconds of game time pass, in as many whole frames as fit.  Time left over carries into the next
+        call, so the game keeps pace with the total time passed to it.  Each frame is its own move in the history.
+        Returns the number of frames played.
+        """
+        frames, self._time_debt = divmod(self._time_debt + dt, gravity.FRAME_TIME)
+        for frame in range(int(frames)):
+            self.step_frame()
+        return int(frames)
+
+    @recorded
+    def step_frame(self):
+        """Plays a single frame: the live piece falls under gravity, and locks if it has rested on the stack for
+        lock_delay frames.
+        """
+        self.frame += 1
+        if self.pose is None or self.game_over:
+            return
+        piece_type, rotation, row, col = self.pose
+        distance = self.ghost_pose()[2] - row
+        if distance:
+            # The piece is falling.  Bank this frame's gravity, and let it fall however many whole rows that makes.
+            self._lock_frames = 0
+            level_gravity = gravity.gravity(self.level)
+            if level_gravity >= gravity.MAX_GRAVITY:
+                rows = distance     # 20G lands the piece straight away, however tall the board is.
+            else:
+                self._gravity_progress += level_gravity
+                rows, self._gravity_progress = divmod(self._gravity_progress, gravity.SUBROWS)
+            if rows:
+                self.pose = (piece_type, rotation, row + min(rows, distance), col)
+                if self.subscribers:
+                    self._emit(events.Move((piece_type, rotation, row, col), self._pose))
+        else:
+            # The piece is resting on the stack.
+            self._gravity_progress = 0
+            self._lock_frames += 1
+            if self._lock_frames >= self.lock_delay:
+                self.lock_piece()
+
+    @recorded
+    def add_garbage(self, holes):
+        """Pushes garbage rows in from the bottom of the board, lifting the stack (see Board.insert_garbage).  If the
+        live piece is in the way, it's pushed up too.
+        holes: the hole column of each garbage row, from the top garbage row down.
+        If the garbage would push dead cells off the top of the board, or there's no room left for the live piece, the
+        game is over.
+        Returns True if the garbage was added.
+        """
+        if self.game_over:
+            return False
+        holes = tuple(holes)
+        if not self.board.insert_garbage(holes):
+            self._top_out()
+            return False
+        if self.subscribers:
+            self._emit(events.Garbage(holes))
+        if self.history is not None:
+            self.last_garbage += holes  # Later garbage goes in under earlier garbage.
+
+        if self.pose is not None and not self.fits(*self.pose):
+            piece_type, rotation, row, col = self.pose
+            for lift in range(1, len(holes) + 1):
+                if self.fits(piece_type, rotation, row - lift, col):
+                    self.pose = (piece_type, rotation, row - lift, col)
+                    if self.subscribers:
+                        self._emit(events.Move((piece_type, rotation, row, col), self._pose))
+                    break
+            else:
+                self._top_out()
+        return True
+
+    def drop_distance(self, pose=None):
+        """Returns how many rows a piece can fall before it lands.
+        pose: the piece's pose.  None uses the live piece.
+        The landing row comes from the piece's bottom profile and the board's column heights.  Only if the piece is
+        tucked under an overhang, where the column heights don't apply, does this probe downward row by row.
+        """
+        if pose is None:
+            pose = self.pose
+        piece_type, rotation, row, col = pose
+        board = self.board
+
+        # In each column, the gap between the piece's lowest cell and the column's topmost dead cell.
+        distance = board.rows
+        for col_offset, row_offset in self._shapes[piece_type][rotation].bottom_profile:
+            gap = board.rows - board.heights[col + col_offset] - 1 - (row + row_offset)
+            if gap < distance:
+                distance = gap
+        if distance >= 0:
+            return distance
+
+        # The piece is below the top of one of its columns, so step it down until it collides.
+        distance = 0
+        while self.fits(piece_type, rotation, row + distance + 1, col):
+            distance += 1
+        return distance
+
+    def lock_piece(self):
+        """Kills the active piece, resolves any tetrises, and creates a new piece."""
+        if self.pose is None or self.game_over:
+            return
+        piece = self.piece
+        self.board.place(piece)
+        self.pose = None
+        if self.subscribers:
+            self._emit(events.Lock(tuple(piece)))
+        tetris_rows = self.check_for_tetrises([row for row, col in piece])
+        self.resolve_tetrises(tetris_rows)
+        self.last_lock = (tuple(piece), tuple(tetris_rows))
+        self.create_piece()
+
+    @recorded
+    def rotate_piece(self, direction):
+        """Rotates the active piece, if possible.
+        direction: "ccw" or "cw"
+        Tries each of the piece's wall kicks in order, and keeps the first one that fits.
+        Returns True if the piece rotated.
+        """
+        if direction == "ccw":
+            rotation_step = -1
+        elif direction == "cw":
+            rotation_step = 1
+        else:
+            raise ValueError("direction must be either 'ccw' or 'cw'.")
+        if self.pose is None or self.game_over:
+            return False
+        piece_type, rotation, row, col = self.pose
+        new_rotation = (rotation + rotation_step) % 4
+
+        for row_kick, col_kick in self.pieces.wall_kicks[piece_type][(rotation, new_rotation)]:
+            rotated = (piece_type, new_rotation, row + row_kick, col + col_kick)
+            if self.fits(*rotated):
+                if self.subscribers:
+                    self._emit(events.Rotate(self._pose, rotated))
+                self.pose = rotated
+                self._reset_lock_delay()
+                return True
+        return False
+
+    def check_for_tetrises(self, rows_to_check=None):
+        """Checks the board for any completed tetrises.
+        All pieces must be dead at this point.
+        rows_to_check: the rows the last piece was placed in.  None checks every row.
+        Returns a list of indices for the rows where tetrises have occurred (an empty list if none have occurred).
+        """
+        return self.board.full_rows(rows_to_check)
+
+    def resolve_tetrises(self, tetris_rows):
+        """Resolves completed tetrises by deleting them and descending blocks above them, and increases the score by
+        however many tetrises were resolved.
+        tetris_rows: A list of rows where tetrises have occurred (empty if none have occurred).
+        """
+        self.board.clear_rows(tetris_rows)
+        self.score = self.score + len(tetris_rows)
+        if tetris_rows and self.subscribers:
+            self._emit(events.Clear(tuple(tetris_rows)))
+            self._emit(events.ScoreChange(self.score, len(tetris_rows)))
+
+    def _top_out(self):
+        """Ends the game."""
+        self.game_over = True
+        if self.subscribers:
+            self._emit(events.TopOut())
+
+    def _reset_timers(self):
+        """Starts the live piece's gravity and lock delay over, as for a newly spawned piece."""
+        self._gravity_progress = 0
+        self._lock_frames = 0
+        self._lock_resets = 0
+
+    def _reset_lock_delay(self):
+        """Restarts the live piece's lock delay after it moves, unless it has used up its max_lock_resets."""
+        if self._lock_frames and self._lock_resets < self.max_lock_resets:
+            self._lock_frames = 0
+            self._lock_resets += 1
+
+    def _move_piece(self, row_step, col_step):
+        """Moves the live piece by (row_step, col_step), unless that would take it off the board or into a dead piece.
+        Returns True if the piece moved.
+        """
+        if self.pose is None:
+            return False
+        piece_type, rotation, row, col = self.pose
+        moved = (piece_type, rotation, row + row_step, col + col_step)
+        if not self.fits(*moved):
+            return False
+        if self.subscribers:
+            self._emit(events.Move(self._pose, moved))
+        self.pose = moved
+        return True
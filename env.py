@@ -0,0 +1,240 @@
+"""Reinforcement learning environment over GameEngine, with the reset()/step() interface of Gym.
+TetrisEnv plays one game at a time with the engine's rules, and never touches tkinter.  It can be driven one input at
+a time ("keys"), or one piece at a time ("placements"):
+keys: each action is one input, as in batch.py (NOOP, LEFT, RIGHT, DOWN, CW, CCW, HARD_DROP), plus HOLD.  There is no
+gravity, so the piece only falls when told to.  DOWN locks the piece if it can't descend.
+placements: each action is where to lock the live piece, as a rotation and the column of its box.  The piece gets
+there by the fewest inputs the placement search (see search.py) finds, including tucks and spins.  info["action_mask"]
+marks the actions that can be reached; any other action hard drops the piece where it spawned.
+Observations are the engine's grid: 0s for empty cells, 1s for dead pieces and 2s for the live piece.  The reward is
+the lines cleared.
+Spaces are described by Discrete and Box, which have the attributes of Gym's spaces of the same names, so nothing here
+needs Gym installed.
+Usage: python env.py measures how long a step takes in each mode, against the engine calls it makes.
+"""
+
+import time
+import numpy as np
+from batch import NOOP, LEFT, RIGHT, DOWN, CW, CCW, HARD_DROP, action_names
+from engine import GameEngine
+from rng import SplitMix64
+from search import PlacementFinder, play_path
+from pieces import tetrominoes
+
+# The keys action that isn't in batch.py.
+HOLD = 7
+key_names = action_names + ("hold",)
+
+
+class Discrete:
+    """The actions 0 to n - 1."""
+
+    def __init__(self, n):
+        self.n = n
+        self.shape = ()
+        self.dtype = np.dtype(np.int64)
+
+    def sample(self, rng):
+        """Returns a random action.  rng: a numpy.random.Generator."""
+        return int(rng.integers(self.n))
+
+    def contains(self, action):
+        """Returns True if action is one of the space's actions."""
+        return 0 <= action < self.n
+
+
+class Box:
+    """Arrays of a fixed shape and dtype with every element between low and high, inclusive."""
+
+    def __init__(self, low, high, shape, dtype):
+        self.low = low
+        self.high = high
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+
+    def sample(self, rng):
+        """Returns a random array.  rng: a numpy.random.Generator."""
+        return rng.integers(self.low, self.high, self.shape, dtype=self.dtype, endpoint=True)
+
+    def contains(self, array):
+        """Returns True if array is in the space."""
+        array = np.asarray(array)
+        return array.shape == self.shape and bool(((array >= self.low) & (array <= self.high)).all())
+
+
+class TetrisEnv:
+    """A game of Tetris as a reinforcement learning environment.
+    actions: "keys" or "placements"; see above.
+    dimensions: a tuple. (rows, cols), including the 2 buffer rows at the top.
+    max_steps: how many steps a game can last before it is truncated.  None lets it go on until it is lost.
+    Other arguments are passed to GameEngine.  Its default board is "array", which makes observations cheapest.
+    The info dict from reset() and step() holds:
+    score: lines cleared this game.  pieces: pieces locked this game.  steps: steps taken this game.
+    queue: the piece queue, as a tuple of piece types.  hold: (held piece or None, whether the live piece can be held).
+    action_mask: in placements mode, a bool array of which actions can be reached.
+    """
+
+    def __init__(self, actions="keys", dimensions=(22, 10), max_steps=None, **options):
+        if actions not in ("keys", "placements"):
+            raise ValueError("actions must be either 'keys' or 'placements'.")
+        self.actions = actions
+        self.dimensions = dimensions
+        self.max_steps = max_steps
+        self.options = options
+        self.pieces = options.get("pieces") or tetrominoes
+        # Shared by every game, so placements found in one are remembered for the next.
+        self.placement_finder = PlacementFinder(self.pieces, options.get("placement_cache_size", 4096))
+        self.observation_space = Box(0, 2, tuple(dimensions), np.uint8)
+        if actions == "keys":
+            self.action_space = Discrete(len(key_names))
+        else:
+            # Every column a piece's box can be in, from the farthest left any piece can go to the farthest right.
+            cols = dimensions[1]
+            shapes = [shape for rotations in self.pieces.shapes for shape in rotations]
+            self.min_col = min(-shape.left for shape in shapes)
+            self.col_count = max(cols - 1 - shape.right for shape in shapes) - self.min_col + 1
+            self.action_space = Discrete(4 * self.col_count)
+        self.seed_rng = SplitMix64()
+        self.engine = None
+        self.steps = 0
+        self.pieces_placed = 0
+        self._placements = None     # Placement for each action, for the live piece; see _placement_table().
+
+    def reset(self, seed=None, options=None):
+        """Starts a new game and returns (observation, info).
+        seed: reseeds the environment, which then picks a seed for each game.  None carries on from the last seed,
+        or from the OS if it has never been seeded.
+        options: unused, for Gym's signature.
+        """
+        if seed is not None:
+            self.seed_rng = SplitMix64(seed)
+        self.engine = GameEngine(self.dimensions, self.seed_rng.next64(), **self.options)
+        self.engine.placement_finder = self.placement_finder
+        self.engine.create_piece()
+        self.steps = 0
+        self.pieces_placed = 0
+        self._placements = None
+        return self.engine.grid, self._info()
+
+    def step(self, action):
+        """Takes one action and returns (observation, reward, terminated, truncated, info).
+        reward: the lines the action cleared.
+        terminated: whether the game was lost.  truncated: whether it hit max_steps.
+        """
+        engine = self.engine
+        if engine is None or engine.game_over:
+            raise RuntimeError("the game is over; call reset() to start a new one.")
+        score = engine.score
+        engine.last_lock = None
+        if self.actions == "keys":
+            self._press(action)
+        else:
+            placement = self._placement_table().get(action)
+            if placement is None:
+                engine.hard_drop()
+            else:
+                play_path(engine, placement.path)
+        if engine.last_lock is not None:
+            self.pieces_placed += 1
+        self._placements = None
+        self.steps += 1
+        truncated = self.max_steps is not None and self.steps >= self.max_steps
+        return engine.grid, engine.score - score, engine.game_over, truncated, self._info()
+
+    def action_mask(self):
+        """Returns a bool array of which actions can be taken.  In keys mode, every action can."""
+        if self.actions == "keys":
+            return np.ones(self.action_space.n, dtype=bool)
+        mask = np.zeros(self.action_space.n, dtype=bool)
+        mask[list(self._placement_table())] = True
+        return mask
+
+    def _press(self, action):
+        """Applies one keys action to the engine."""
+        engine = self.engine
+        if action == LEFT:
+            engine.shift_piece("l")
+        elif action == RIGHT:
+            engine.shift_piece("r")
+        elif action == DOWN:
+            engine.descend_piece()
+        elif action == CW:
+            engine.rotate_piece("cw")
+        elif action == CCW:
+            engine.rotate_piece("ccw")
+        elif action == HARD_DROP:
+            engine.hard_drop()
+        elif action == HOLD:
+            engine.hold_piece()
+        elif action != NOOP:
+            raise ValueError("action must be between 0 and " + str(len(key_names) - 1) + ".")
+
+    def _placement_table(self):
+        """Returns a dict from each reachable placements action to the Placement it plays, for the live piece.  Where
+        several placements have the same rotation and column (eg tucks under an overhang), the one with the fewest
+        inputs is used.
+        """
+        if self._placements is None:
+            self._placements = {}
+            for placement in sorted(self.engine.placements(), key=lambda placement: len(placement.path)):
+                piece_type, rotation, row, col = placement.pose
+                self._placements.setdefault(rotation * self.col_count + col - self.min_col, placement)
+        return self._placements
+
+    def _info(self):
+        """Returns the info dict for the current state."""
+        engine = self.engine
+        info = {"score": engine.score, "pieces": self.pieces_placed, "steps": self.steps, "queue": engine.queue,
+                "hold": engine.hold}
+        if self.actions == "placements":
+            info["action_mask"] = self.action_mask()
+        return info
+
+
+def measure_step_time(actions, steps=20000, seed=0):
+    """Returns (seconds per env step, seconds per step of the engine calls alone) over steps random actions, taking
+    only actions that can be reached.  In placements mode the engine calls include finding the next piece's
+    placements, which every step needs for its action mask.
+    actions: "keys" or "placements".
+    """
+    env = TetrisEnv(actions)
+    uncached = PlacementFinder(env.pieces, 0)
+    rng = np.random.default_rng(seed)
+    observation, info = env.reset(seed)
+    env_time = engine_time = 0.0
+    for step in range(steps):
+        if actions == "keys":
+            action = env.action_space.sample(rng)
+        else:
+            action = int(rng.choice(np.flatnonzero(info["action_mask"])))
+            path = env._placement_table()[action].path
+        engine = env.engine
+        before = engine.snapshot()
+
+        start = time.perf_counter()
+        observation, reward, terminated, truncated, info = env.step(action)
+        env_time += time.perf_counter() - start
+
+        # Play the same action again with bare engine calls, from the same state, then put the env's state back.
+        after = engine.snapshot()
+        engine.restore(before)
+        start = time.perf_counter()
+        if actions == "keys":
+            env._press(action)
+        else:
+            play_path(engine, path)
+            uncached.find(engine.board, engine.pose[0], engine.pose)
+        engine_time += time.perf_counter() - start
+        engine.restore(after)
+
+        if terminated or truncated:
+            observation, info = env.reset()
+    return env_time / steps, engine_time / steps
+
+
+if __name__ == "__main__":
+    for actions, steps in (("keys", 20000), ("placements", 2000)):
+        env_time, engine_time = measure_step_time(actions, steps)
+        print(actions + ": " + format(env_time * 1e6, ".1f") + " us per step, of which the engine takes "
+              + format(engine_time * 1e6, ".1f") + " us (" + format((env_time - engine_time) * 1e6, ".1f")
+              + " us overhead)")
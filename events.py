@@ -0,0 +1,30 @@
+"""Events a GameEngine emits as its game changes.
+Anything that wants to follow a game (a renderer, a logger, a network broadcaster) subscribes a callback with
+GameEngine.subscribe(), and the callback is called with each event as it happens.  Subscribers decide for themselves
+what to do with them, eg a renderer can note what changed and redraw once per frame, however many events arrive.
+An engine with no subscribers doesn't create any events.
+"""
+
+from collections import namedtuple
+
+# A new live piece appeared.  pose is its spawn pose, and queue is the piece queue after it was dealt.
+Spawn = namedtuple("Spawn", ["pose", "queue"])
+# The live piece moved without rotating: a shift, a descent, a fall under gravity or a hard drop, or being pushed up by
+# garbage.
+Move = namedtuple("Move", ["pose_before", "pose_after"])
+# The live piece rotated, including any wall kick.
+Rotate = namedtuple("Rotate", ["pose_before", "pose_after"])
+# The live piece was put in the hold slot.  hold is the engine's (held_piece, can_hold) afterwards.
+Hold = namedtuple("Hold", ["hold"])
+# The live piece locked into the board, covering cells.
+Lock = namedtuple("Lock", ["cells"])
+# Full rows were cleared.  rows are their indices from before the clear, in order.
+Clear = namedtuple("Clear", ["rows"])
+# Garbage rows were pushed in from the bottom of the board.  holes are their hole columns, from the top row down.
+Garbage = namedtuple("Garbage", ["holes"])
+# The score changed by change, to score.
+ScoreChange = namedtuple("ScoreChange", ["score", "change"])
+# The game was lost.
+TopOut = namedtuple("TopOut", [])
+# The whole game state was replaced by restore(), undo() or redo(), so anything derived from it is out of date.
+Restore = namedtuple("Restore", [])
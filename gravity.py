@@ -0,0 +1,27 @@
+"""Gravity and timing for real-time play.
+The engine advances in fixed frames of 1/FRAME_RATE seconds, however unevenly real time is handed to it, so the same
+sequence of inputs and frames always plays out the same way.
+Gravity is measured in subrows per frame, with SUBROWS subrows to a row, so that fractions of a row can be accumulated
+from frame to frame exactly, in integers.
+"""
+
+import math
+
+FRAME_RATE = 60
+FRAME_TIME = 1 / FRAME_RATE    # seconds
+SUBROWS = 1 << 16
+
+# 20G: the fastest gravity.  The engine lands the piece on the stack in the frame it spawns or moves, however far it
+# has to fall.
+MAX_GRAVITY = 20 * SUBROWS
+
+# Gravity for levels 1 to 20.  Levels follow the Tetris Guideline curve, where the piece falls 1 row every
+# (0.8 - (level - 1) * 0.007) ** (level - 1) seconds, up to 20G, and level 20 is 20G.
+# Rounding up means a piece never falls slower than the curve.
+gravity_table = tuple(min(math.ceil(SUBROWS / ((0.8 - (level - 1) * 0.007) ** (level - 1) * FRAME_RATE)), MAX_GRAVITY)
+                      for level in range(1, 20)) + (MAX_GRAVITY,)
+
+
+def gravity(level):
+    """Returns the gravity, in subrows per frame, for a level.  Levels past the end of the table use its last entry."""
+    return gravity_table[max(1, min(level, len(gravity_table))) - 1]
@@ -0,0 +1,85 @@
+"""Bounded undo/redo history for the engine.
+Each move (one call to a GameEngine action such as shift_piece or hard_drop) is stored as a delta rather than a copy
+of the board: the live piece's pose before and after, the cells the move locked, the rows it cleared, the garbage rows
+it added, and how the score, queue and randomizer changed.  Cleared rows were full, so their indices are all that's
+needed to put them back.  The history holds at most size moves each way, so its memory is bounded by size, not by the
+length of the game.
+"""
+
+from collections import deque, namedtuple
+
+# One move, as a delta.  placed_cells and cleared_rows are empty tuples if the move didn't lock a piece.  garbage holds
+# the hole columns of any garbage rows the move pushed in from the bottom, after its line clears, from the top row down.
+Move = namedtuple("Move", ["pose_before", "pose_after", "placed_cells", "cleared_rows", "score_change",
+                           "queue_before", "queue_after", "randomizer_before", "randomizer_after", "game_over_before",
+                           "game_over_after", "hold_before", "hold_after", "garbage",
+                           "mode_before", "mode_after"])
+
+
+class History:
+    """Ring buffers of the moves that can be undone and redone.
+    size: the most moves to keep in each direction.  The oldest moves are forgotten first.
+    """
+
+    def __init__(self, size):
+        self.undo_moves = deque(maxlen=size)
+        self.redo_moves = deque(maxlen=size)
+
+    def record(self, engine, before):
+        """Records the move engine just made, unless it changed nothing.  Making a new move forgets the redo moves.
+        before: (pose, queue, randomizer state, score, game_over, hold, mode_state) from before the move.
+        """
+        pose_before, queue_before, randomizer_before, score_before, game_over_before, hold_before, mode_before = before
+        placed_cells, cleared_rows = engine.last_lock or ((), ())
+        mode_after = engine.mode_state
+        if (engine.pose == pose_before and not placed_cells and engine.hold == hold_before and not engine.last_garbage
+                and mode_after == mode_before and engine.game_over == game_over_before):
+            return
+        self.undo_moves.append(Move(pose_before, engine.pose, placed_cells, cleared_rows, engine.score - score_before,
+                                    queue_before, engine.queue, randomizer_before, engine.randomizer.getstate(),
+                                    game_over_before, engine.game_over, hold_before, engine.hold,
+                                    engine.last_garbage, mode_before, mode_after))
+        self.redo_moves.clear()
+
+    def undo(self, engine):
+        """Takes back the last move.  Returns False if there was nothing to undo."""
+        if not self.undo_moves:
+            return False
+        move = self.undo_moves.pop()
+        engine.board.remove_garbage(len(move.garbage))
+        if move.placed_cells:
+            engine.board.unclear_rows(list(move.cleared_rows))
+            engine.board.remove(move.placed_cells)
+        engine.pose = move.pose_before
+        engine.queue = move.queue_before
+        engine.randomizer.setstate(move.randomizer_before)
+        engine.score -= move.score_change
+        engine.game_over = move.game_over_before
+        engine.hold = move.hold_before
+        engine.mode_state = move.mode_before
+        self.redo_moves.append(move)
+        return True
+
+    def redo(self, engine):
+        """Makes the last undone move again.  Returns False if there was nothing to redo."""
+        if not self.redo_moves:
+            return False
+        move = self.redo_moves.pop()
+        if move.placed_cells:
+            engine.board.place(move.placed_cells)
+            engine.board.clear_rows(list(move.cleared_rows))
+        engine.board.insert_garbage(move.garbage)
+        engine.pose = move.pose_after
+        engine.queue = move.queue_after
+        engine.randomizer.setstate(move.randomizer_after)
+        engine.score += move.score_change
+        engine.game_over = move.game_over_after
+        engine.hold = move.hold_after
+        engine.mode_state = move.mode_after
+        self.undo_moves.append(move)
+        return True
+
+    def clear(self):
+        """Forgets every move."""
+        self.undo_moves.clear()
+        self.redo_moves.clear()
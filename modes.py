@@ -0,0 +1,164 @@
+"""Game modes built on garbage rows.
+CheeseRaceEngine: the board starts with messy garbage, and the goal is to dig through a set number of garbage rows.
+VersusEngine: two games where clearing lines sends garbage to the opponent.
+Both are GameEngines, so they play, search and render like any other game.  Garbage holes come from each game's own
+random number generator, seeded from the game's seed, so a seeded game always deals the same garbage.
+Each mode's own state (its garbage generator, garbage left to clear, waiting attacks) is its mode_state, so snapshots
+and the undo history cover it along with the board.  Attacks already sent to an opponent stay sent.
+"""
+
+from engine import GameEngine
+from rng import SplitMix64
+from zobrist import mix64
+
+# Salt that keeps a game's garbage holes apart from its pieces when both come from the same seed.
+GARBAGE_SALT = 0xBE5466CF34E90C6C
+
+# Garbage rows sent for clearing 0, 1, 2, 3 or 4 lines at once.  Bigger clears send as much as a 4 line clear.
+attack_table = (0, 0, 1, 2, 4)
+
+
+def create_garbage_rng(seed):
+    """Returns the random number generator for a game's garbage holes.
+    seed: the game's seed.  None seeds from the OS.
+    """
+    return SplitMix64(None if seed is None else mix64(seed ^ GARBAGE_SALT))
+
+
+def cheese_holes(rng, count, cols, previous=None):
+    """Returns the holes of count rows of cheese: garbage whose hole moves to a new column on every row.
+    previous: the hole of the row above the first one, which the first hole avoids.  None lets it go anywhere.
+    """
+    holes = []
+    for row in range(count):
+        hole = rng.randrange(cols)
+        if hole == previous and cols > 1:
+            hole = (hole + 1 + rng.randrange(cols - 1)) % cols
+        holes.append(hole)
+        previous = hole
+    return holes
+
+
+class CheeseRaceEngine(GameEngine):
+    """A race to clear a set number of rows of cheese garbage.
+    lines: how many garbage rows there are to clear in all.
+    visible_lines: how many garbage rows are on the board at once.  Cleared garbage is replaced from below until all
+    of it has been added.
+    Other arguments are passed to GameEngine.
+    """
+
+    def __init__(self, dimensions=(22, 10), seed=None, lines=18, visible_lines=10, **options):
+        super().__init__(dimensions, seed, **options)
+        self.garbage_rng = create_garbage_rng(seed)
+        self.lines = lines
+        self.visible_lines = visible_lines
+        self.lines_left = lines     # Garbage rows not yet cleared.
+        self.lines_to_add = lines   # Garbage rows not yet added to the board.
+        self.garbage_holes = []     # Hole of each garbage row on the board, from the top down.  They're always the
+                                    # bottom rows.
+        self._refill_garbage()
+        if self.history is not None:
+            self.history.clear()    # The starting garbage is part of the game, not a move to undo.
+
+    @property
+    def mode_state(self):
+        """(garbage_rng state, lines_left, lines_to_add, garbage_holes), as a tuple."""
+        return (self.garbage_rng.getstate(), self.lines_left, self.lines_to_add, tuple(self.garbage_holes))
+
+    @mode_state.setter
+    def mode_state(self, state):
+        rng_state, self.lines_left, self.lines_to_add, garbage_holes = state
+        self.garbage_rng.setstate(rng_state)
+        self.garbage_holes = list(garbage_holes)
+
+    @property
+    def finished(self):
+        """True once every garbage row has been cleared."""
+        return self.lines_left == 0
+
+    def resolve_tetrises(self, tetris_rows):
+        """Resolves completed tetrises as GameEngine does, then replaces any garbage rows that were cleared."""
+        first_garbage_row = self.board.rows - len(self.garbage_holes)
+        cleared = {row - first_garbage_row for row in tetris_rows if row >= first_garbage_row}
+        super().resolve_tetrises(tetris_rows)
+        self.garbage_holes = [hole for index, hole in enumerate(self.garbage_holes) if index not in cleared]
+        self.lines_left -= len(cleared)
+        self._refill_garbage()
+
+    def _refill_garbage(self):
+        """Adds garbage rows under the stack until visible_lines are showing or none are left to add."""
+        count = min(self.visible_lines - len(self.garbage_holes), self.lines_to_add)
+        if count <= 0:
+            return
+        # The new rows go in under the garbage already on the board, so carry on the cheese from its bottom row.
+        previous = self.garbage_holes[-1] if self.garbage_holes else None
+        holes = cheese_holes(self.garbage_rng, count, self.board.cols, previous)
+        if self.add_garbage(holes):
+            self.garbage_holes += holes
+            self.lines_to_add -= count
+
+
+class VersusEngine(GameEngine):
+    """One side of a versus game.  Clearing 2 or more lines at once attacks the opponent with garbage rows (see
+    attack_table), after first cancelling out garbage that is waiting to come in.  Waiting garbage comes in when a
+    piece locks without clearing any lines.  Each attack comes in as clean garbage, with one hole for all of its rows.
+    Use create_versus() to make a pair of games.
+    Other arguments are passed to GameEngine.
+    """
+
+    def __init__(self, dimensions=(22, 10), seed=None, **options):
+        super().__init__(dimensions, seed, **options)
+        self.garbage_rng = create_garbage_rng(seed)
+        self.opponent = None
+        self.pending_garbage = []   # Rows in each attack waiting to come in, oldest first.
+        self.lines_sent = 0
+        self.lines_received = 0
+
+    @property
+    def mode_state(self):
+        """(garbage_rng state, pending_garbage, lines_sent, lines_received), as a tuple."""
+        return (self.garbage_rng.getstate(), tuple(self.pending_garbage), self.lines_sent, self.lines_received)
+
+    @mode_state.setter
+    def mode_state(self, state):
+        rng_state, pending_garbage, self.lines_sent, self.lines_received = state
+        self.garbage_rng.setstate(rng_state)
+        self.pending_garbage = list(pending_garbage)
+
+    def receive_attack(self, rows):
+        """Queues an attack of rows garbage rows to come in when this game next locks a piece without clearing."""
+        if rows:
+            self.pending_garbage.append(rows)
+
+    def resolve_tetrises(self, tetris_rows):
+        """Resolves completed tetrises as GameEngine does, then attacks the opponent or takes in waiting garbage."""
+        super().resolve_tetrises(tetris_rows)
+        if not tetris_rows:
+            for rows in self.pending_garbage:
+                self.add_garbage([self.garbage_rng.randrange(self.board.cols)] * rows)
+                self.lines_received += rows
+            self.pending_garbage = []
+            return
+
+        attack = attack_table[min(len(tetris_rows), len(attack_table) - 1)]
+        # Cancel waiting garbage first, oldest first.
+        while attack and self.pending_garbage:
+            cancelled = min(attack, self.pending_garbage[0])
+            attack -= cancelled
+            self.pending_garbage[0] -= cancelled
+            if not self.pending_garbage[0]:
+                self.pending_garbage.pop(0)
+        if attack and self.opponent is not None:
+            self.opponent.receive_attack(attack)
+            self.lines_sent += attack
+
+
+def create_versus(dimensions=(22, 10), seed=None, **options):
+    """Returns a pair of VersusEngines playing against each other.
+    seed: seeds both games, which get different pieces and garbage from it.  None seeds each from the OS.
+    Other arguments are passed to both GameEngines.
+    """
+    seeds = (None, None) if seed is None else (mix64(seed), mix64(seed + 1))
+    first, second = (VersusEngine(dimensions, game_seed, **options) for game_seed in seeds)
+    first.opponent, second.opponent = second, first
+    return first, second
@@ -0,0 +1,173 @@
+"""Piece registry for the engine.
+A PieceSet holds any collection of polyominoes.  Each piece is registered by drawing its spawn orientation in a square
+bounding box, and everything gameplay and search need is precomputed right then: its 4 rotation states, each state's
+bounding box, bottom profile and row bitmasks, its wall kicks, and where it spawns.  The engine only ever uses these
+precomputed forms.
+Rotation states are the box turned clockwise in place, indexed 0 (spawn), 1 (R, one turn clockwise), 2 (two turns)
+and 3 (L, one turn counterclockwise).  Cells are (row, col) tuples relative to the top left corner of the box, with
+row 0 at the top.
+Two sets are provided: tetrominoes, the 7 standard pieces with Super Rotation System (SRS) kicks, and pentominoes, the
+18 one-sided pentominoes with basic kicks.
+"""
+
+from collections import namedtuple
+
+# One rotation state of a piece, precomputed.
+# cells: tuple of (row, col) cells.
+# row_masks: tuple of (row, mask) pairs, where bit col of mask is set for each cell in that row.  Shifting a mask left by
+# the pose's col gives the board row mask the piece covers.
+# top, bottom, left, right: the state's bounding box within the piece's box, inclusive.
+# bottom_profile: tuple of (col, row) pairs giving the lowest cell in each column the state covers.
+Shape = namedtuple("Shape", ["cells", "row_masks", "top", "bottom", "left", "right", "bottom_profile"])
+
+# SRS kick offsets, as (x, y) with y pointing up, to try in order when rotating from one state to another.
+jlstz_kicks = {(0, 1): [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
+               (1, 0): [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
+               (1, 2): [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
+               (2, 1): [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
+               (2, 3): [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
+               (3, 2): [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)],
+               (3, 0): [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)],
+               (0, 3): [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)]}
+i_kicks = {(0, 1): [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],
+           (1, 0): [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
+           (1, 2): [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)],
+           (2, 1): [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)],
+           (2, 3): [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
+           (3, 2): [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],
+           (3, 0): [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)],
+           (0, 3): [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)]}
+o_kicks = {transition: [(0, 0)] for transition in jlstz_kicks}
+
+# Kicks for pieces registered without their own: try in place, then one step left or right, then one step up.
+basic_kicks = {transition: [(0, 0), (-1, 0), (1, 0), (0, 1)] for transition in jlstz_kicks}
+
+
+def create_rotation_states(box):
+    """Returns the 4 rotation states of a piece, as tuples of cells, starting with the spawn orientation.
+    box: the spawn orientation, as a list of strings where "#" marks a cell.
+    """
+    size = max(len(box), max(len(line) for line in box))   # Pad non-square drawings out to a square box.
+    state = tuple((row, col) for row, line in enumerate(box) for col, char in enumerate(line) if char == "#")
+    states = []
+    for rotation in range(4):
+        states.append(state)
+        # Turn the box 90 degrees clockwise in place.
+        state = tuple(sorted((col, size - 1 - row) for row, col in state))
+    return tuple(states)
+
+
+def create_shape(cells):
+    """Returns the Shape of a rotation state with the given cells."""
+    rows = sorted({row for row, col in cells})
+    cols = sorted({col for row, col in cells})
+    row_masks = tuple((row, sum(1 << col for r, col in cells if r == row)) for row in rows)
+    bottom_profile = tuple((col, max(row for row, c in cells if c == col)) for col in cols)
+    return Shape(tuple(cells), row_masks, rows[0], rows[-1], cols[0], cols[-1], bottom_profile)
+
+
+def create_kick_table(kicks):
+    """Converts SRS (x, y) kick offsets into (row, col) offsets.
+    Returns a dict mapping (rotation, new_rotation) to a tuple of offsets to try in order.
+    """
+    return {transition: tuple((-y, x) for x, y in offsets) for transition, offsets in kicks.items()}
+
+
+class PieceSet:
+    """An ordered set of pieces.  Pieces are referred to by their index, in the order they were registered.
+    names[piece_type] is the piece's name.
+    shapes[piece_type][rotation] is a Shape.
+    wall_kicks[piece_type][(rotation, new_rotation)] is a tuple of (row, col) offsets to try in order.
+    box_sizes[piece_type] is the width of the piece's bounding box.
+    spawn_rows[piece_type] is the row of the box's top edge when the piece spawns, such that its topmost cell is in
+    row 0.
+    preview_cells[piece_type] is the spawn orientation, shifted so its topmost and leftmost cells are in row and col 0.
+    preview_size is the (rows, cols) needed to draw any piece's preview.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.shapes = []
+        self.wall_kicks = []
+        self.box_sizes = []
+        self.spawn_rows = []
+        self.preview_cells = []
+        self.preview_size = (0, 0)
+
+    def __len__(self):
+        return len(self.names)
+
+    def register(self, name, box, kicks=None):
+        """Adds a piece to the set and precomputes its tables.  Returns its index.
+        name: the piece's name.
+        box: the spawn orientation, as a list of strings where "#" marks a cell.
+        kicks: SRS-style kick offsets, as a dict mapping (rotation, new_rotation) to a list of (x, y) offsets with y
+        pointing up.  None uses basic_kicks.
+        """
+        if not any("#" in line for line in box):
+            raise ValueError("box must contain at least one cell.")
+        shapes = tuple(create_shape(state) for state in create_rotation_states(box))
+        spawn = shapes[0]
+
+        self.names.append(name)
+        self.shapes.append(shapes)
+        self.wall_kicks.append(create_kick_table(basic_kicks if kicks is None else kicks))
+        self.box_sizes.append(max(len(box), max(len(line) for line in box)))
+        self.spawn_rows.append(-spawn.top)
+        self.preview_cells.append(tuple((row - spawn.top, col - spawn.left) for row, col in spawn.cells))
+        self.preview_size = (max(self.preview_size[0], spawn.bottom - spawn.top + 1),
+                             max(self.preview_size[1], spawn.right - spawn.left + 1))
+        return len(self.names) - 1
+
+    def spawn_pose(self, piece_type, cols):
+        """Returns the pose a piece spawns in on a board with the given number of columns: centered (rounding left),
+        with its topmost cell in row 0.
+        """
+        return (piece_type, 0, self.spawn_rows[piece_type], (cols - self.box_sizes[piece_type]) // 2)
+
+
+# The 7 standard tetrominoes, with SRS kicks.
+tetrominoes = PieceSet()
+tetrominoes.register("I", ["....",
+                           "####",
+                           "....",
+                           "...."], i_kicks)
+tetrominoes.register("J", ["#..",
+                           "###",
+                           "..."], jlstz_kicks)
+tetrominoes.register("L", ["..#",
+                           "###",
+                           "..."], jlstz_kicks)
+tetrominoes.register("O", ["##",
+                           "##"], o_kicks)
+tetrominoes.register("S", [".##",
+                           "##.",
+                           "..."], jlstz_kicks)
+tetrominoes.register("Z", ["##.",
+                           ".##",
+                           "..."], jlstz_kicks)
+tetrominoes.register("T", [".#.",
+                           "###",
+                           "..."], jlstz_kicks)
+
+# The 18 one-sided pentominoes.  Mirror images are separate pieces, named with a trailing apostrophe.
+pentominoes = PieceSet()
+for pentomino_name, pentomino_box in [("F", [".##", "##.", ".#."]),
+                                      ("F'", ["##.", ".##", ".#."]),
+                                      ("I", [".....", ".....", "#####", ".....", "....."]),
+                                      ("L", ["...#", "####", "....", "...."]),
+                                      ("L'", ["#...", "####", "....", "...."]),
+                                      ("N", ["##..", ".###", "....", "...."]),
+                                      ("N'", ["..##", "###.", "....", "...."]),
+                                      ("P", ["##.", "##.", "#.."]),
+                                      ("P'", ["##.", "##.", ".#."]),
+                                      ("T", ["###", ".#.", ".#."]),
+                                      ("U", ["#.#", "###", "..."]),
+                                      ("V", ["#..", "#..", "###"]),
+                                      ("W", ["#..", "##.", ".##"]),
+                                      ("X", [".#.", "###", ".#."]),
+                                      ("Y", ["..#.", "####", "....", "...."]),
+                                      ("Y'", [".#..", "####", "....", "...."]),
+                                      ("Z", ["##.", ".#.", ".##"]),
+                                      ("Z'", [".##", ".#.", "##."])]:
+    pentominoes.register(pentomino_name, pentomino_box)
@@ -0,0 +1,118 @@
+"""Randomizers that choose which pieces a game deals.
+Each randomizer owns its own seeded random number generator, so a game's pieces depend only on its seed, and its whole
+state can be saved with getstate() and put back with setstate().  States are plain ints and tuples of ints, so they can
+be stored, compared, pickled or written out as they are.
+Three randomizers are provided:
+UniformRandomizer: every piece is equally likely every time, independently.
+BagRandomizer: deals every piece once, in a shuffled order, then reshuffles.  With the 7 tetrominoes, this is the
+7-bag.
+HistoryRandomizer: rerolls pieces that were dealt recently, a few times, which makes droughts and repeats rare without
+making the order predictable.
+"""
+
+from rng import SplitMix64
+
+
+class UniformRandomizer:
+    """Deals each piece independently, with every piece equally likely.
+    count: the number of pieces to choose from.
+    seed: an int.  None seeds from the OS.
+    """
+
+    def __init__(self, count, seed=None):
+        self.count = count
+        self.rng = SplitMix64(seed)
+
+    def next(self):
+        """Returns the next piece to deal."""
+        return self.rng.randrange(self.count)
+
+    def getstate(self):
+        """Returns the randomizer's state, for setstate()."""
+        return self.rng.getstate()
+
+    def setstate(self, state):
+        """Returns the randomizer to a state from getstate()."""
+        self.rng.setstate(state)
+
+
+class BagRandomizer(UniformRandomizer):
+    """Deals every piece once, in a random order, then starts a new bag.
+    count: the number of pieces to choose from.
+    seed: an int.  None seeds from the OS.
+    """
+
+    def __init__(self, count, seed=None):
+        super().__init__(count, seed)
+        self.bag = ()   # Pieces left in the current bag, in the order they'll be dealt.
+
+    def next(self):
+        """Returns the next piece to deal."""
+        if not self.bag:
+            # Shuffle a new bag (Fisher-Yates).
+            bag = list(range(self.count))
+            for index in range(self.count - 1, 0, -1):
+                swap = self.rng.randrange(index + 1)
+                bag[index], bag[swap] = bag[swap], bag[index]
+            self.bag = tuple(bag)
+        piece_type = self.bag[0]
+        self.bag = self.bag[1:]
+        return piece_type
+
+    def getstate(self):
+        """Returns the randomizer's state, for setstate()."""
+        return (self.rng.getstate(), self.bag)
+
+    def setstate(self, state):
+        """Returns the randomizer to a state from getstate()."""
+        rng_state, self.bag = state
+        self.rng.setstate(rng_state)
+
+
+class HistoryRandomizer(UniformRandomizer):
+    """Deals each piece at random, but rerolls a piece that is among the last few dealt, up to a limit.
+    count: the number of pieces to choose from.
+    seed: an int.  None seeds from the OS.
+    history_size: how many of the last pieces dealt to avoid.
+    rolls: how many times to roll before dealing a recent piece anyway.
+    """
+
+    def __init__(self, count, seed=None, history_size=4, rolls=6):
+        super().__init__(count, seed)
+        self.history_size = history_size
+        self.rolls = rolls
+        self.history = ()   # The last pieces dealt, oldest first.
+
+    def next(self):
+        """Returns the next piece to deal."""
+        for roll in range(self.rolls):
+            piece_type = self.rng.randrange(self.count)
+            if piece_type not in self.history:
+                break
+        self.history = (self.history + (piece_type,))[-self.history_size:]
+        return piece_type
+
+    def getstate(self):
+        """Returns the randomizer's state, for setstate()."""
+        return (self.rng.getstate(), self.history)
+
+    def setstate(self, state):
+        """Returns the randomizer to a state from getstate()."""
+        rng_state, self.history = state
+        self.rng.setstate(rng_state)
+
+
+randomizers = {"uniform": UniformRandomizer,
+               "bag": BagRandomizer,
+               "history": HistoryRandomizer}
+
+
+def create_randomizer(kind, count, seed=None):
+    """Returns a new randomizer.
+    kind: "uniform", "bag" or "history"
+    count: the number of pieces to choose from.
+    seed: an int.  None seeds from the OS.
+    """
+    if kind not in randomizers:
+        raise ValueError("kind must be one of " + ", ".join(repr(name) for name in randomizers) + ".")
+    return randomizers[kind](count, seed)
@@ -0,0 +1,167 @@
+"""Shared-memory ring buffers, for passing game records between processes without pickling them.
+A SharedRing lives in one multiprocessing.shared_memory block, split into lanes.  Each lane is a ring of slots with one
+writer and one reader, and each slot holds one record: an array for each of the ring's fields, eg a board, an action
+and a reward.  Writers fill slots in place and readers get NumPy views of them, so records are never pickled or copied
+on the way through.
+Each lane keeps two sequence numbers in the block's header:
+written: how many records the writer has published.  Only the writer changes it.
+read: how many records the reader has released.  Only the reader changes it.
+Record n goes in slot n % slots.  The writer fills slot written % slots once it is free (written - read < slots), then
+publishes it by adding 1 to written.  The reader reads slot read % slots once it has been published (read < written),
+then releases it by adding 1 to read.  The writer closes its lane when it is done, so the reader knows when to stop.
+Sequence numbers are aligned 64-bit words, stored after the record they publish, which is enough for other processes to
+see them in order on x86-64.
+Processes started by multiprocessing can attach to a ring with SharedRing.attach(ring.spec).  The process that created
+the ring should close() and unlink() it once everyone is done with it.
+"""
+
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+
+# Everything needed to attach to a ring from another process; see SharedRing.spec.
+RingSpec = namedtuple("RingSpec", ["name", "slots", "lanes", "fields"])
+
+# Each lane's header is a cache line of 8 words.  These are the ones in use.
+WRITTEN = 0
+READ = 1
+CLOSED = 2
+HEADER_WORDS = 8
+# Every field starts on a cache line of its own.
+ALIGNMENT = 64
+
+
+def ring_layout(slots, lanes, fields):
+    """Returns (size, offsets): the number of bytes a ring needs, and the byte offset of each field's array, by name.
+    Each field's array is shaped (lanes, slots) + the field's shape.
+    """
+    offset = lanes * HEADER_WORDS * 8
+    offsets = {}
+    for name, shape, dtype in fields:
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        offsets[name] = offset
+        offset += lanes * slots * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+    return max(offset, 1), offsets
+
+
+class SharedRing:
+    """Ring buffers of records in shared memory, one per lane.
+    slots: how many records a lane holds before its writer has to wait for its reader.
+    fields: a (name, shape, dtype) tuple for each array in a record, eg ("board", (22, 10), "uint8").
+    lanes: how many writer and reader pairs the ring has.
+    name: the shared memory block's name.  None picks a unique one.
+    """
+
+    # Seconds to sleep between checks while waiting for the other side.
+    poll_time = 0.0001
+
+    def __init__(self, slots, fields, lanes=1, name=None, create=True):
+        self.slots = slots
+        self.lanes = lanes
+        self.fields = tuple((field_name, tuple(shape), np.dtype(dtype).str) for field_name, shape, dtype in fields)
+        size, offsets = ring_layout(slots, lanes, self.fields)
+        self.memory = shared_memory.SharedMemory(name, create=create, size=size)
+        self.header = np.ndarray((lanes, HEADER_WORDS), np.uint64, self.memory.buf)
+        if create:
+            self.header[:] = 0
+        self.arrays = {field_name: np.ndarray((lanes, slots) + shape, dtype, self.memory.buf, offsets[field_name])
+                       for field_name, shape, dtype in self.fields}
+
+    @classmethod
+    def attach(cls, spec):
+        """Returns a SharedRing for a ring that another process created, from its spec."""
+        return cls(spec.slots, spec.fields, spec.lanes, spec.name, create=False)
+
+    @property
+    def spec(self):
+        """The ring's RingSpec, for attach().  It can be pickled and sent to other processes."""
+        return RingSpec(self.memory.name, self.slots, self.lanes, self.fields)
+
+    def claim(self, lane=0):
+        """Waits until lane has a free slot and returns its record, as a dict of writable arrays by field name, for
+        the writer to fill in and publish().
+        """
+        header = self.header[lane]
+        while header[WRITTEN] - header[READ] >= self.slots:
+            time.sleep(self.poll_time)
+        return self._record(lane, int(header[WRITTEN]) % self.slots)
+
+    def publish(self, lane=0):
+        """Publishes the record the writer claimed last in lane to its reader."""
+        self.header[lane, WRITTEN] += 1
+
+    def write(self, lane=0, **values):
+        """Copies values, by field name, into lane's next record and publishes it."""
+        record = self.claim(lane)
+        for field_name, value in values.items():
+            record[field_name][...] = value
+        self.publish(lane)
+
+    def close_lane(self, lane=0):
+        """Marks lane as finished.  Its reader still gets every record published before this."""
+        self.header[lane, CLOSED] = 1
+
+    def peek(self, lane=0, wait=True):
+        """Returns lane's oldest unreleased record, as a dict of read-only views by field name.  The views are only
+        good until release(), so copy anything that has to outlive them.
+        wait: whether to wait for a record to be published.
+        Returns None if there is no record: the lane is closed and fully read, or wait is False and none is ready.
+        """
+        header = self.header[lane]
+        while True:
+            closed = header[CLOSED]     # Checked before written, so a closed lane can't publish anything after it.
+            if header[READ] < header[WRITTEN]:
+                return self._record(lane, int(header[READ]) % self.slots, writable=False)
+            if closed or not wait:
+                return None
+            time.sleep(self.poll_time)
+
+    def release(self, lane=0):
+        """Hands the record from peek() in lane back to the writer."""
+        self.header[lane, READ] += 1
+
+    def finished(self, lane=0):
+        """Returns True if lane is closed and every record in it has been released."""
+        header = self.header[lane]
+        return bool(header[CLOSED]) and header[READ] >= header[WRITTEN]
+
+    def records(self):
+        """Yields (lane, record) for every record in every lane, as peek() returns them, until every lane is finished.
+        Each record is released when the next one is asked for.
+        """
+        lanes = list(range(self.lanes))
+        while lanes:
+            idle = True
+            for lane in list(lanes):
+                record = self.peek(lane, wait=False)
+                if record is None:
+                    if self.finished(lane):
+                        lanes.remove(lane)
+                    continue
+                idle = False
+                yield lane, record
+                self.release(lane)
+            if idle:
+                time.sleep(self.poll_time)
+
+    def close(self):
+        """Detaches this process from the ring.  Views of it must not be used afterwards."""
+        self.header = None
+        self.arrays = None
+        self.memory.close()
+
+    def unlink(self):
+        """Frees the ring's shared memory once every process has closed it."""
+        self.memory.unlink()
+
+    def _record(self, lane, slot, writable=True):
+        """Returns the record in lane's slot, as a dict of views by field name."""
+        record = {}
+        for field_name, array in self.arrays.items():
+            view = array[lane, slot, ...]   # The ... keeps scalar fields as 0-d views rather than copies.
+            if not writable:
+                view = view.view()
+                view.flags.writeable = False
+            record[field_name] = view
+        return record
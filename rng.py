@@ -0,0 +1,47 @@
+"""Small random number generator for the engine.
+random.Random's Mersenne Twister carries 625 words of state, so saving and restoring it dominates the cost of a game
+snapshot.  SplitMix64 carries a single 64-bit counter, so its state is one int, but it is still a good generator for
+choosing pieces.
+"""
+
+import os
+from zobrist import MASK_64, mix64
+
+
+class SplitMix64:
+    """Seeded 64-bit random number generator whose whole state is a single int.
+    seed: an int.  None seeds from the OS.
+    """
+
+    __slots__ = ("state",)
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), "little")
+        self.state = seed & MASK_64
+
+    def next64(self):
+        """Returns the next random 64-bit int."""
+        self.state = (self.state + 0x9E3779B97F4A7C15) & MASK_64
+        return mix64(self.state)
+
+    def randrange(self, stop):
+        """Returns a random int in range(stop), with every value equally likely."""
+        # Reject the top sliver of 64-bit values that would make low results more likely.
+        limit = (1 << 64) - (1 << 64) % stop
+        while True:
+            value = self.next64()
+            if value < limit:
+                return value % stop
+
+    def random(self):
+        """Returns a random float in [0, 1)."""
+        return (self.next64() >> 11) / (1 << 53)
+
+    def getstate(self):
+        """Returns the generator's state, for setstate()."""
+        return self.state
+
+    def setstate(self, state):
+        """Returns the generator to a state from getstate()."""
+        self.state = state
@@ -0,0 +1,167 @@
+"""Placement search for bots and analysis tools.
+Given a board and a piece, finds every distinct position the piece can lock in, including tucks and spins that need
+shifts and rotations after the piece has started falling, along with a sequence of inputs that gets it there.
+The search is a breadth-first search over poses, using the same collision test and wall kicks as the engine, but it
+never touches a GameEngine's state: it only asks the board whether each pose fits.
+While every rotation and kick a piece could try stays inside the open air above the stack (below the top of the board
+and above every dead cell), the piece can make exactly the same moves on every row, so a descent through those rows is
+taken as one step to the lowest of them instead of one row at a time.  Poses part way down the open air are never
+visited, which is most of the board.  Rows near the top of the board, where it can block a rotation, and rows near the
+stack are still searched one at a time.
+"""
+
+from collections import OrderedDict, deque, namedtuple
+
+# A position a piece can lock in.
+# pose: (piece_type, rotation, row, col) of the piece when it locks.
+# path: a tuple of inputs that takes the piece from its starting pose to pose.  Each input is "l" or "r"
+# (GameEngine.shift_piece), "cw" or "ccw" (GameEngine.rotate_piece), "d" (GameEngine.descend_piece), or "hold"
+# (GameEngine.hold_piece, only ever first).  The piece then locks with GameEngine.hard_drop(), or with one more "d".
+Placement = namedtuple("Placement", ["pose", "path"])
+
+# The shift inputs, as (input, col step), and the rotation inputs, as (input, rotation step).
+shifts = (("l", -1), ("r", 1))
+rotations = (("cw", 1), ("ccw", -1))
+
+
+class PlacementFinder:
+    """Finds placements for pieces from a PieceSet, remembering recent results.
+    pieces: the pieces.PieceSet the pieces come from.
+    cache_size: how many (board, starting pose) results to remember.  The least recently used is forgotten first.  0
+    remembers nothing.
+    Results are looked up by the board's 64-bit hash, so two different boards that happen to share a hash would share
+    results.  With 64 bits this is vanishingly unlikely.
+    """
+
+    def __init__(self, pieces, cache_size=4096):
+        self.pieces = pieces
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.reaches = [self._reach(piece_type) for piece_type in range(len(pieces))]
+        self.hits = 0
+        self.misses = 0
+
+    def find(self, board, piece_type, pose=None):
+        """Returns a tuple of Placements, one for each distinct set of cells the piece can lock in.
+        board: the board.Board to search.
+        piece_type: which piece to place.
+        pose: where the piece starts.  None starts it at its spawn pose.
+        When several poses cover the same cells (eg the O piece's 4 rotations), the one reached with the fewest
+        inputs is kept.
+        """
+        if pose is None:
+            pose = self.pieces.spawn_pose(piece_type, board.cols)
+        key = (board.hash, board.rows, board.cols, pose)
+        placements = self.cache.get(key)
+        if placements is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return placements
+
+        self.misses += 1
+        placements = self._search(board, pose)
+        if self.cache_size:
+            self.cache[key] = placements
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return placements
+
+    def clear(self):
+        """Forgets every remembered result."""
+        self.cache.clear()
+
+    def _search(self, board, start):
+        """Returns the Placements reachable from the start pose; see find()."""
+        piece_type = start[0]
+        shapes = self.pieces.shapes[piece_type]
+        kicks = self.pieces.wall_kicks[piece_type]
+        collides = board.collides_shape
+        # Every row from open_bottom up is empty.  Poses from open_top to fall_row can make the same moves on any row.
+        open_bottom = board.rows - max(board.heights) - 1
+        top_reach, bottom_reach = self.reaches[piece_type]
+        open_top, fall_row = -top_reach, open_bottom - bottom_reach
+
+        if collides(shapes[start[1]], start[2], start[3]):
+            return ()
+        parents = {start: None}    # Each visited pose, mapped to (previous pose, inputs that led from it).
+        queue = deque([start])
+        locked = {}     # Cells of each lock position found, mapped to the pose that reached it first.
+        while queue:
+            pose = queue.popleft()
+            _, rotation, row, col = pose
+            shape = shapes[rotation]
+
+            for move, col_step in shifts:
+                moved = (piece_type, rotation, row, col + col_step)
+                if moved not in parents and not collides(shape, row, col + col_step):
+                    parents[moved] = (pose, (move,))
+                    queue.append(moved)
+
+            for move, rotation_step in rotations:
+                new_rotation = (rotation + rotation_step) % 4
+                new_shape = shapes[new_rotation]
+                for row_kick, col_kick in kicks[(rotation, new_rotation)]:
+                    if not collides(new_shape, row + row_kick, col + col_kick):
+                        rotated = (piece_type, new_rotation, row + row_kick, col + col_kick)
+                        if rotated not in parents:
+                            parents[rotated] = (pose, (move,))
+                            queue.append(rotated)
+                        break
+
+            # Fall straight through any open air, or else try to descend 1 row.
+            fall = fall_row - row
+            if fall > 1 and row >= open_top:
+                descended = (piece_type, rotation, fall_row, col)
+                if descended not in parents:
+                    parents[descended] = (pose, ("d",) * fall)
+                    queue.append(descended)
+            elif not collides(shape, row + 1, col):
+                descended = (piece_type, rotation, row + 1, col)
+                if descended not in parents:
+                    parents[descended] = (pose, ("d",))
+                    queue.append(descended)
+            else:
+                # The piece is resting on something, so it can lock here.
+                cells = tuple((row + cell_row, col + cell_col) for cell_row, cell_col in shape.cells)
+                if cells not in locked:
+                    locked[cells] = pose
+
+        return tuple(Placement(pose, self._path(parents, pose)) for pose in locked.values())
+
+    def _reach(self, piece_type):
+        """Returns (top_reach, bottom_reach): the highest and lowest rows, relative to a pose's row, that a piece's
+        cells can cover in any of its rotation states or after any of its kicks.
+        """
+        shapes = self.pieces.shapes[piece_type]
+        offsets = [(0, shape) for shape in shapes]
+        for (rotation, new_rotation), kicks in self.pieces.wall_kicks[piece_type].items():
+            offsets += [(row_kick, shapes[new_rotation]) for row_kick, col_kick in kicks]
+        return (min(row_kick + shape.top for row_kick, shape in offsets),
+                max(row_kick + shape.bottom for row_kick, shape in offsets))
+
+    @staticmethod
+    def _path(parents, pose):
+        """Returns the inputs that lead from the search's starting pose to pose."""
+        steps = []
+        while parents[pose] is not None:
+            pose, moves = parents[pose]
+            steps.append(moves)
+        return tuple(move for moves in reversed(steps) for move in moves)
+
+
+def play_path(engine, path):
+    """Feeds a placement's path to an engine's live piece, one input at a time, then locks the piece.
+    Returns True if every input moved the piece.
+    """
+    moved = True
+    for move in path:
+        if move == "l" or move == "r":
+            moved = engine.shift_piece(move) and moved
+        elif move == "d":
+            moved = engine.descend_piece() and moved
+        elif move == "hold":
+            moved = engine.hold_piece() and moved
+        else:
+            moved = engine.rotate_piece(move) and moved
+    engine.hard_drop()
+    return moved
@@ -0,0 +1,210 @@
+"""Plays many headless games with a bot policy, spread over a pool of worker processes, and reports how they went.
+Usage: python simulate.py --games 1000 --workers 8 --seed 1 --policy greedy
+Every game gets its own seed, derived from --seed and the game's index, so each game plays out the same way whichever
+worker runs it.  Results are collected in game order, so everything but the timings is identical for any number of
+workers.
+simulate() can also stream every placement, as (game, board, action, reward) records, into a SharedRing (see ring.py)
+for another process to read as it happens; see ring_fields().
+"""
+
+import argparse
+import multiprocessing
+import time
+from collections import namedtuple
+from board import boards
+from engine import GameEngine
+from randomizer import randomizers
+from ring import SharedRing
+from rng import SplitMix64
+from search import play_path
+from zobrist import MASK_64, mix64
+
+# Salt that keeps a game's policy choices apart from its pieces when both come from the same seed.
+POLICY_SALT = 0x3F84D5B5B5470917
+
+# How one game went.  score is the lines cleared, as in GameEngine, pieces is how many pieces were placed before the
+# game was lost or stopped, and seconds is the time spent playing it.
+GameResult = namedtuple("GameResult", ["index", "seed", "score", "pieces", "seconds"])
+
+# Totals over every game.  lines is the lines cleared in all of them, and score_percentiles maps 10, 50 and 90 to the
+# score at that percentile.
+Summary = namedtuple("Summary", ["games", "lines", "mean_score", "min_score", "max_score",
+                                 "score_percentiles", "mean_pieces", "seconds_per_piece"])
+
+
+# The ring a pool worker writes to, attached by _start_worker(), and the lane it writes in.
+_worker_ring = None
+_worker_lane = 0
+
+
+def ring_fields(dimensions=(22, 10)):
+    """Returns the fields of the SharedRing records simulate() writes, one per placement:
+    game: the game's index.
+    board: the board's dead cells before the placement, as 0s and 1s.
+    action: the pose the piece was placed in, (piece_type, rotation, row, col).
+    reward: the lines the placement cleared.
+    """
+    return (("game", (), "int64"),
+            ("board", tuple(dimensions), "uint8"),
+            ("action", (4,), "int64"),
+            ("reward", (), "int64"))
+
+
+def game_seed(seed, index):
+    """Returns the seed of game number index in a simulation seeded with seed."""
+    return mix64((seed + index * 0x9E3779B97F4A7C15) & MASK_64)
+
+
+def random_policy(engine, rng):
+    """Returns a placement for the live piece chosen at random."""
+    placements = engine.placements()
+    return placements[rng.randrange(len(placements))]
+
+
+def greedy_policy(engine, rng):
+    """Returns the placement for the live piece that looks best right now: the most lines cleared, then the fewest
+    holes, then the lowest stack.  Ties are broken at random.
+    """
+    board = engine.board
+    best, best_value = None, None
+    for placement in engine.placements():
+        cells = engine.cells(*placement.pose)
+        board.place(cells)
+        value = (len(board.full_rows([row for row, col in cells])), -board.holes(), -max(board.heights),
+                 rng.random())
+        board.remove(cells)
+        if best_value is None or value > best_value:
+            best, best_value = placement, value
+    return best
+
+
+# Policies, by the name simulate accepts.  Each is called with the engine and a random number generator of its own,
+# and returns one of engine.placements().
+policies = {"random": random_policy,
+            "greedy": greedy_policy}
+
+
+def play_game(task, ring=None, lane=0):
+    """Plays one game to the end, or until max_pieces have been placed, and returns its GameResult.
+    task: (index, seed, policy name, max_pieces, engine options), so that it can be sent to a worker process.
+    ring: a SharedRing with ring_fields() to write each placement to, in lane.  None doesn't write them.
+    """
+    index, seed, policy_name, max_pieces, options = task
+    policy = policies[policy_name]
+    start = time.perf_counter()
+    engine = GameEngine(seed=seed, **options)
+    rng = SplitMix64(seed ^ POLICY_SALT)
+    engine.create_piece()
+    pieces = 0
+    while not engine.game_over and pieces < max_pieces:
+        placement = policy(engine, rng)
+        if placement is None:   # Nowhere to put the piece.
+            break
+        if ring is not None:
+            record = ring.claim(lane)
+            record["game"][...] = index
+            record["board"][...] = engine.board.to_array()
+            record["action"][...] = placement.pose
+            score = engine.score
+        play_path(engine, placement.path)
+        if ring is not None:
+            record["reward"][...] = engine.score - score
+            ring.publish(lane)
+        pieces += 1
+    return GameResult(index, seed, engine.score, pieces, time.perf_counter() - start)
+
+
+def _start_worker(spec, lanes):
+    """Attaches a pool worker to the ring with spec, and takes a lane of it from the lanes queue."""
+    global _worker_ring, _worker_lane
+    _worker_ring = SharedRing.attach(spec)
+    _worker_lane = lanes.get()
+
+
+def _play_in_worker(task):
+    """Plays one game in a pool worker, writing to the worker's lane of the ring, if there is one."""
+    return play_game(task, _worker_ring, _worker_lane)
+
+
+def summarize(results):
+    """Returns the Summary of a non-empty list of GameResults."""
+    games = len(results)
+    scores = sorted(result.score for result in results)
+    lines = sum(scores)
+    pieces = sum(result.pieces for result in results)
+    seconds = sum(result.seconds for result in results)
+    return Summary(games, lines, lines / games, scores[0], scores[-1],
+                   {percentile: scores[min(games - 1, games * percentile // 100)] for percentile in (10, 50, 90)},
+                   pieces / games, seconds / pieces if pieces else 0.0)
+
+
+def simulate(games, seed=0, workers=1, policy="greedy", max_pieces=500, ring=None, **options):
+    """Plays games games and returns (list of GameResults in game order, Summary).
+    games: how many games to play.  Must be at least 1.
+    seed: the simulation's seed; each game's seed is derived from it.
+    workers: how many processes to play in.  1 plays in this process.
+    policy: the name of a policy in policies.
+    max_pieces: the most pieces to play in one game.
+    ring: a SharedRing with ring_fields() and a lane for each worker, to write every placement to.  Each worker writes
+    the games it plays, in order, to a lane of its own, and every lane is closed at the end.  Something else has to
+    read the ring as the games are played, eg another process or thread, or the workers wait for it.  None doesn't
+    write placements anywhere.
+    Other arguments are passed to GameEngine.
+    """
+    if games < 1:
+        raise ValueError("games must be at least 1.")
+    if policy not in policies:
+        raise ValueError("policy must be one of " + ", ".join(repr(name) for name in policies) + ".")
+    if ring is not None and ring.lanes < workers:
+        raise ValueError("ring must have a lane for each worker.")
+    tasks = [(index, game_seed(seed, index), policy, max_pieces, options) for index in range(games)]
+    if workers == 1:
+        results = [play_game(task, ring) for task in tasks]
+    else:
+        initializer, initargs = None, ()
+        if ring is not None:
+            lanes = multiprocessing.Queue()
+            for lane in range(workers):
+                lanes.put(lane)
+            initializer, initargs = _start_worker, (ring.spec, lanes)
+        with multiprocessing.Pool(workers, initializer, initargs) as pool:
+            results = pool.map(_play_in_worker, tasks, chunksize=max(1, games // (workers * 4)))
+    if ring is not None:
+        for lane in range(ring.lanes):
+            ring.close_lane(lane)
+    return results, summarize(results)
+
+
+def main():
+    """Runs a simulation from the command line and prints its Summary."""
+    parser = argparse.ArgumentParser(description="Play headless games with a bot policy and report how they went.")
+    parser.add_argument("--games", type=int, default=100, help="how many games to play")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="how many processes to use")
+    parser.add_argument("--seed", type=int, default=0, help="seed the game seeds are derived from")
+    parser.add_argument("--policy", choices=sorted(policies), default="greedy", help="how the bot picks placements")
+    parser.add_argument("--max-pieces", type=int, default=500, help="the most pieces to play in one game")
+    parser.add_argument("--randomizer", choices=sorted(randomizers), default="bag",
+                        help="how pieces are dealt")
+    parser.add_argument("--board", choices=sorted(boards), default="bitboard", help="board backend")
+    arguments = parser.parse_args()
+    if arguments.games < 1:
+        parser.error("--games must be at least 1")
+
+    start = time.perf_counter()
+    results, summary = simulate(arguments.games, arguments.seed, arguments.workers, arguments.policy,
+                                arguments.max_pieces, randomizer=arguments.randomizer, board=arguments.board)
+    elapsed = time.perf_counter() - start
+
+    print("Games:           " + str(summary.games))
+    print("Lines:           " + str(summary.lines))
+    print("Score:           mean " + format(summary.mean_score, ".2f") + ", min " + str(summary.min_score)
+          + ", max " + str(summary.max_score) + ", "
+          + ", ".join("p" + str(percentile) + " " + str(score)
+                      for percentile, score in summary.score_percentiles.items()))
+    print("Pieces survived: " + format(summary.mean_pieces, ".1f") + " per game")
+    print("Time per piece:  " + format(summary.seconds_per_piece * 1e6, ".0f") + " us")
+    print("Wall time:       " + format(elapsed, ".2f") + " s with " + str(arguments.workers) + " workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""Lets the tests import the game's modules, which live at the top of the repository."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,66 @@
+"""Tests that BatchEngine plays by the same rules as GameEngine."""
+
+import random
+
+import numpy as np
+import pytest
+
+from batch import NOOP, LEFT, RIGHT, DOWN, CW, CCW, HARD_DROP, BatchEngine
+from engine import GameEngine
+from pieces import pentominoes, tetrominoes
+from simulate import greedy_policy
+
+# The GameEngine call for each batch action, as (method name, arguments).
+engine_calls = {LEFT: ("shift_piece", ("l",)), RIGHT: ("shift_piece", ("r",)), DOWN: ("descend_piece", ()),
+                CW: ("rotate_piece", ("cw",)), CCW: ("rotate_piece", ("ccw",)), HARD_DROP: ("hard_drop", ())}
+# The batch action for each input in a placement's path.
+path_actions = {"l": LEFT, "r": RIGHT, "d": DOWN, "cw": CW, "ccw": CCW}
+
+
+class SequenceRandomizer:
+    """Deals pieces from a fixed list, so two engines can be dealt the same pieces."""
+
+    def __init__(self, sequence):
+        self.pieces = iter(sequence)
+
+    def next(self):
+        return next(self.pieces)
+
+
+@pytest.mark.parametrize("pieces", [tetrominoes, pentominoes], ids=["tetrominoes", "pentominoes"])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_lockstep_with_game_engine(pieces, seed):
+    rng = random.Random(seed)
+    sequence = [rng.randrange(len(pieces)) for piece in range(2000)]
+
+    batch = BatchEngine(1, seed=seed, pieces=pieces)
+    batch_pieces = iter(sequence)
+    batch._deal = lambda games: np.array([next(batch_pieces) for game in games])
+    batch.reset()
+
+    engine = GameEngine(seed=seed, pieces=pieces)
+    engine.randomizer = SequenceRandomizer(sequence)
+    engine.queue = (engine.randomizer.next(),)
+    engine.create_piece()
+
+    # Mostly play greedy placements, so the games last and clear lines, with random inputs mixed in.
+    plan = []
+    for step in range(1500):
+        if rng.random() < 0.1:
+            action = rng.choice((NOOP, LEFT, RIGHT, DOWN, CW, CCW))
+            plan = []
+        else:
+            if not plan:
+                plan = [path_actions[move] for move in greedy_policy(engine, rng).path] + [HARD_DROP]
+            action = plan.pop(0)
+        batch.step(np.array([action]))
+        if action != NOOP:
+            name, args = engine_calls[action]
+            getattr(engine, name)(*args)
+
+        assert (batch.boards[0] == engine.board.to_array()).all()
+        assert (int(batch.piece_type[0]), int(batch.rotation[0]), int(batch.row[0]), int(batch.col[0])) == engine.pose
+        assert batch.score[0] == engine.score
+        assert batch.game_over[0] == engine.game_over
+        if engine.game_over:
+            break
@@ -0,0 +1,316 @@
+"""Rule tests for GameEngine, run against every board backend."""
+
+import random
+
+import numpy as np
+import pytest
+
+from board import boards, create_board
+from engine import GameEngine
+
+# Inputs random_moves() picks from, as (action name, arguments).
+actions = [("shift_piece", ("l",)), ("shift_piece", ("r",)), ("rotate_piece", ("cw",)), ("rotate_piece", ("ccw",)),
+           ("descend_piece", ()), ("hard_drop", ()), ("hold_piece", ())]
+
+
+@pytest.fixture(params=sorted(boards))
+def kind(request):
+    """The board backend to test."""
+    return request.param
+
+
+def new_game(kind, seed=1, **options):
+    """Returns a GameEngine on a kind board with its first piece spawned."""
+    engine = GameEngine(seed=seed, board=kind, **options)
+    engine.create_piece()
+    return engine
+
+
+def random_moves(engine, rng, count):
+    """Makes up to count random moves, stopping if the game is lost."""
+    for move in range(count):
+        if engine.game_over:
+            return
+        name, args = rng.choice(actions)
+        getattr(engine, name)(*args)
+
+
+def assert_bookkeeping(board):
+    """Checks a board's counts, heights and hash against a recompute from its cells."""
+    grid = board.to_array()
+    assert board.row_counts == [int(count) for count in grid.sum(axis=1)]
+    assert board.cell_count == int(grid.sum())
+    assert board.heights == [board.rows - int(np.argmax(column)) if column.any() else 0 for column in grid.T]
+    kind = next(name for name, board_class in boards.items() if type(board) is board_class)
+    rebuilt = create_board(kind, (board.rows, board.cols))
+    rebuilt.place([(int(row), int(col)) for row, col in np.argwhere(grid)])
+    assert board.hash == rebuilt.hash
+    assert board.holes() == rebuilt.holes()
+
+
+def fill_row(board, row, hole=None):
+    """Places dead cells across a row, leaving hole empty."""
+    board.place([(row, col) for col in range(board.cols) if col != hole])
+
+
+def test_shift_stops_at_wall(kind):
+    engine = new_game(kind)
+    while engine.shift_piece("l"):
+        pass
+    assert min(col for row, col in engine.piece) == 0
+    assert not engine.shift_piece("l")
+    assert engine.shift_piece("r")
+
+
+def test_shift_rejects_bad_direction(kind):
+    engine = new_game(kind)
+    with pytest.raises(ValueError):
+        engine.shift_piece("u")
+    with pytest.raises(TypeError):
+        engine.shift_piece(1)
+
+
+def test_rotation_kicks_off_wall(kind):
+    engine = new_game(kind)
+    engine.pose = (0, 1, 0, -2)     # A vertical I against the left wall.
+    assert engine.rotate_piece("cw")
+    assert engine.pose == (0, 2, 0, 0)
+    assert engine.piece == [(2, 0), (2, 1), (2, 2), (2, 3)]
+
+
+def test_rotation_kicks_off_floor(kind):
+    engine = new_game(kind)
+    engine.pose = (0, 0, 20, 3)     # A flat I lying on the floor.
+    assert engine.rotate_piece("cw")
+    assert engine.pose == (0, 1, 18, 4)     # Only the last kick, 2 rows up, fits.
+    assert engine.piece == [(18, 6), (19, 6), (20, 6), (21, 6)]
+
+
+def test_descend_locks_when_landed(kind):
+    engine = new_game(kind)
+    next_piece = engine.next_piece
+    while engine.descend_piece():
+        pass
+    assert engine.board.cell_count == 4
+    assert engine.board.row_counts[21] > 0
+    assert engine.pose[0] == next_piece
+
+
+def test_hard_drop_lands_on_stack(kind):
+    engine = new_game(kind)
+    fill_row(engine.board, 21, hole=0)
+    engine.pose = (3, 0, 0, 4)      # O piece over columns 4 and 5.
+    assert engine.hard_drop() == 19
+    assert engine.board.to_array()[19:21, 4:6].all()
+    assert_bookkeeping(engine.board)
+
+
+def test_hard_drop_clears_rows(kind):
+    engine = new_game(kind)
+    for row in range(18, 22):
+        fill_row(engine.board, row, hole=0)
+    engine.pose = (0, 1, 0, -2)     # A vertical I over column 0.
+    engine.hard_drop()
+    assert engine.score == 4
+    assert engine.board.cell_count == 0
+    assert_bookkeeping(engine.board)
+
+
+def test_clear_rows_in_one_pass(kind):
+    board = create_board(kind, (22, 10))
+    fill_row(board, 21)
+    fill_row(board, 20, hole=3)
+    fill_row(board, 19)
+    board.place([(18, 5), (17, 5)])
+    board.clear_rows(board.full_rows())
+    grid = board.to_array()
+    assert grid[21].sum() == 9 and not grid[21, 3]
+    assert grid[19:21, 5].all()
+    assert board.cell_count == 11
+    assert_bookkeeping(board)
+
+
+def test_bookkeeping_matches_recompute(kind):
+    rng = random.Random(2)
+    engine = new_game(kind, seed=2)
+    for step in range(50):
+        random_moves(engine, rng, 20)
+        assert_bookkeeping(engine.board)
+        if engine.game_over:
+            break
+
+
+def test_backends_play_identical_games():
+    games = {}
+    for kind in sorted(boards):
+        rng = random.Random(3)
+        engine = new_game(kind, seed=3)
+        trace = []
+        for step in range(200):
+            random_moves(engine, rng, 5)
+            trace.append((engine.hash, engine.pose, engine.score, engine.game_over))
+        games[kind] = (trace, engine.grid)
+    (array_trace, array_grid), (bit_trace, bit_grid) = games["array"], games["bitboard"]
+    assert array_trace == bit_trace
+    assert (array_grid == bit_grid).all()
+
+
+def test_undo_redo_round_trip(kind):
+    rng = random.Random(4)
+    engine = GameEngine(seed=4, board=kind, history_size=1000)
+    states = [(engine.hash, engine.score, engine.game_over)]
+    engine.create_piece()
+    states.append((engine.hash, engine.score, engine.game_over))
+    for step in range(300):
+        if engine.game_over:
+            break
+        name, args = rng.choice(actions)
+        undo_depth = len(engine.history.undo_moves)
+        getattr(engine, name)(*args)
+        if len(engine.history.undo_moves) > undo_depth:
+            states.append((engine.hash, engine.score, engine.game_over))
+
+    for state in reversed(states[:-1]):
+        assert engine.undo()
+        assert (engine.hash, engine.score, engine.game_over) == state
+        assert_bookkeeping(engine.board)
+    assert not engine.undo()
+    for state in states[1:]:
+        assert engine.redo()
+        assert (engine.hash, engine.score, engine.game_over) == state
+        assert_bookkeeping(engine.board)
+    assert not engine.redo()
+
+
+def test_snapshot_restore_round_trip(kind):
+    rng = random.Random(5)
+    engine = new_game(kind, seed=5)
+    random_moves(engine, rng, 100)
+    snapshot = engine.snapshot()
+    grid, score, state_hash = engine.grid, engine.score, engine.hash
+    rng_state = rng.getstate()
+    random_moves(engine, rng, 150)
+    future = (engine.hash, engine.score)
+
+    engine.restore(snapshot)
+    assert (engine.grid == grid).all()
+    assert (engine.score, engine.hash) == (score, state_hash)
+    assert_bookkeeping(engine.board)
+    # The randomizer was restored too, so the same moves play out the same way.
+    rng.setstate(rng_state)
+    random_moves(engine, rng, 150)
+    assert (engine.hash, engine.score) == future
+
+
+def test_insert_garbage(kind):
+    board = create_board(kind, (22, 10))
+    board.place([(21, 0), (20, 0)])
+    assert board.insert_garbage([2, 7])
+    grid = board.to_array()
+    assert grid[18:20, 0].all()
+    assert grid[20].sum() == 9 and not grid[20, 2]
+    assert grid[21].sum() == 9 and not grid[21, 7]
+    assert (board.heights[0], board.heights[2], board.heights[7]) == (4, 1, 2)
+    assert_bookkeeping(board)
+
+    board.remove_garbage(2)
+    assert [tuple(cell) for cell in np.argwhere(board.to_array())] == [(20, 0), (21, 0)]
+    assert_bookkeeping(board)
+
+
+def test_insert_garbage_overflow(kind):
+    board = create_board(kind, (22, 10))
+    for row in range(2, 22):
+        fill_row(board, row, hole=row % 10)
+    state_hash = board.hash
+    assert not board.insert_garbage([0, 1, 2])
+    assert board.hash == state_hash
+    with pytest.raises(ValueError):
+        board.insert_garbage([10])
+
+
+def test_add_garbage_lifts_piece(kind):
+    engine = new_game(kind)
+    engine.pose = (3, 0, 20, 4)     # O piece resting on the floor.
+    assert engine.add_garbage([0, 0])
+    assert engine.pose == (3, 0, 18, 4)
+    assert not engine.game_over
+    assert_bookkeeping(engine.board)
+
+
+def test_add_garbage_tops_out(kind):
+    engine = new_game(kind)
+    assert not engine.add_garbage([0] * 23)
+    assert engine.game_over
+    assert engine.board.cell_count == 0
+
+
+def test_actions_ignored_after_top_out(kind):
+    engine = new_game(kind)
+    while not engine.game_over:
+        engine.hard_drop()
+    grid, state_hash, pose = engine.grid, engine.hash, engine.pose
+    assert not engine.shift_piece("l")
+    assert not engine.rotate_piece("cw")
+    assert not engine.descend_piece()
+    assert engine.hard_drop() == 0
+    assert not engine.hold_piece()
+    assert not engine.add_garbage([0])
+    engine.create_piece()
+    engine.step_frame()
+    assert (engine.grid == grid).all()
+    assert (engine.hash, engine.pose) == (state_hash, pose)
+    assert_bookkeeping(engine.board)
+
+
+def test_undo_redo_garbage_top_out(kind):
+    engine = new_game(kind, history_size=10)
+    assert not engine.add_garbage([0] * 23)
+    assert engine.game_over
+    assert engine.undo()
+    assert not engine.game_over
+    assert engine.redo()
+    assert engine.game_over
+
+
+def test_wide_board_hash():
+    # Columns past the 64th have mixed keys rather than their bits, and both backends have to agree on them.
+    rng = random.Random(8)
+    boards_by_kind = {kind: create_board(kind, (30, 100)) for kind in boards}
+    for step in range(20):
+        row = rng.randrange(5, 30)
+        cells = [(row, col) for col in rng.sample(range(100), 10) if not boards_by_kind["array"].grid[row, col]]
+        for board in boards_by_kind.values():
+            board.place(cells)
+        if step % 5 == 0:
+            gaps = [(29, col) for col in range(100) if not boards_by_kind["array"].grid[29, col]]
+            for board in boards_by_kind.values():
+                board.place(gaps)
+                board.clear_rows(board.full_rows())
+    for board in boards_by_kind.values():
+        assert_bookkeeping(board)
+    assert boards_by_kind["array"].hash == boards_by_kind["bitboard"].hash
+
+
+@pytest.mark.parametrize("queue_size", [1, 5, 70])
+def test_queue_hash_follows_spawns(queue_size):
+    # create_piece moves the queue's hash up a slot instead of rehashing it, which has to agree with a rehash.
+    engine = GameEngine(seed=6, queue_size=queue_size)
+    for spawn in range(100):
+        engine.create_piece()
+        state_hash = engine.hash
+        engine.queue = engine.queue
+        assert engine.hash == state_hash
+
+
+def test_unclear_rows_restores_top_row(kind):
+    # The cleared row is the top of the stack, with an empty row between it and the cells below.
+    board = create_board(kind, (22, 10))
+    board.place([(21, 0), (21, 1), (20, 4)])
+    fill_row(board, 18)
+    before = board.snapshot()
+    board.clear_rows([18])
+    assert_bookkeeping(board)
+    board.unclear_rows([18])
+    assert board.snapshot()[1:] == before[1:]
+    assert_bookkeeping(board)
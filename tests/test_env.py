@@ -0,0 +1,81 @@
+"""Tests for TetrisEnv's placements actions, seeding and spaces."""
+
+import numpy as np
+import pytest
+
+from env import TetrisEnv
+
+
+def play_masked(env, rng, steps):
+    """Resets env with seed 7, then takes up to steps random actions from its action mask, checking every
+    observation.  Returns the observations.
+    """
+    observation, info = env.reset(seed=7)
+    observations = [observation]
+    for step in range(steps):
+        assert env.observation_space.contains(observation)
+        action = int(rng.choice(np.flatnonzero(env.action_mask())))
+        assert env.action_space.contains(action)
+        observation, reward, terminated, truncated, info = env.step(action)
+        observations.append(observation)
+        if terminated:
+            break
+    assert env.observation_space.contains(observation)
+    return observations
+
+
+def test_masked_actions_lock_where_they_say():
+    env = TetrisEnv("placements")
+    rng = np.random.default_rng(1)
+    play_masked(env, rng, 15)   # Build up a stack, so some placements need tucks or spins.
+    engine = env.engine
+    before = engine.snapshot()
+    mask = env.action_mask()
+    table = dict(env._placement_table())
+    assert sorted(table) == list(np.flatnonzero(mask))
+    for action, placement in table.items():
+        engine.restore(before)
+        env._placements = None
+        env.step(action)
+        piece_type, rotation, row, col = placement.pose
+        assert (rotation, col) == (action // env.col_count, action % env.col_count + env.min_col)
+        assert sorted(engine.last_lock[0]) == sorted(engine.cells(*placement.pose))
+
+
+def test_unmasked_action_hard_drops():
+    env = TetrisEnv("placements")
+    observation, info = env.reset(seed=3)
+    engine = env.engine
+    expected = sorted(engine.cells(*engine.ghost_pose()))
+    action = int(np.flatnonzero(~info["action_mask"])[0])
+    env.step(action)
+    assert sorted(engine.last_lock[0]) == expected
+    assert env.pieces_placed == 1
+
+
+@pytest.mark.parametrize("actions", ["keys", "placements"])
+def test_reset_seed_is_reproducible(actions):
+    first, second = TetrisEnv(actions), TetrisEnv(actions)
+    first_observations = play_masked(first, np.random.default_rng(2), 30)
+    second_observations = play_masked(second, np.random.default_rng(2), 30)
+    assert len(first_observations) == len(second_observations)
+    for first_observation, second_observation in zip(first_observations, second_observations):
+        assert (first_observation == second_observation).all()
+
+    # Reseeding the same env starts the same game again.
+    assert (first.reset(seed=7)[0] == first_observations[0]).all()
+    assert first.engine.queue == second.reset(seed=7)[1]["queue"]
+
+
+def test_observations_in_space():
+    env = TetrisEnv("keys", dimensions=(12, 6))
+    rng = np.random.default_rng(4)
+    observation, info = env.reset(seed=4)
+    for step in range(300):
+        assert env.observation_space.contains(observation)
+        observation, reward, terminated, truncated, info = env.step(env.action_space.sample(rng))
+        if terminated:
+            observation, info = env.reset()
+    assert observation.dtype == env.observation_space.dtype
+    assert not env.observation_space.contains(np.full((12, 6), 3))
+    assert not env.observation_space.contains(np.zeros((22, 10)))
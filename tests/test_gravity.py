@@ -0,0 +1,67 @@
+"""Tests for GameEngine's frame clock, gravity and lock delay."""
+
+import pytest
+
+import gravity
+from engine import GameEngine
+
+
+def new_game(seed=1, **options):
+    """Returns a GameEngine with its first piece spawned."""
+    engine = GameEngine(seed=seed, **options)
+    engine.create_piece()
+    return engine
+
+
+@pytest.mark.parametrize("dimensions", [(22, 10), (1002, 10)])
+def test_max_gravity_lands_in_one_frame(dimensions):
+    engine = new_game(dimensions=dimensions, level=20)
+    assert gravity.gravity(engine.level) == gravity.MAX_GRAVITY
+    landing_pose = engine.ghost_pose()
+    engine.step_frame()
+    assert engine.pose == landing_pose
+    assert engine.drop_distance() == 0
+
+
+def test_tick_chunks_add_up():
+    # 1.005 seconds is 60.3 frames, so no chunk boundary lands on a frame boundary.
+    whole, chunked = new_game(seed=2), new_game(seed=2)
+    assert whole.tick(1.005) == 60
+    assert sum(chunked.tick(dt) for dt in (0.004, 0.3, 0.0005, 0.2, 0.5005)) == 60
+    assert whole.frame == chunked.frame == 60
+    assert (whole.pose, whole.hash) == (chunked.pose, chunked.hash)
+    assert (whole.grid == chunked.grid).all()
+
+
+def rest_o_piece(engine):
+    """Puts an O piece on the floor of an empty board, in the middle."""
+    engine.pose = (3, 0, engine.board.rows - 2, 4)
+    assert engine.drop_distance() == 0
+
+
+def test_lock_delay():
+    engine = new_game(lock_delay=5)
+    rest_o_piece(engine)
+    for frame in range(4):
+        engine.step_frame()
+    assert engine.board.cell_count == 0
+    engine.step_frame()
+    assert engine.board.cell_count == 4
+
+
+def test_lock_resets_are_limited():
+    engine = new_game(lock_delay=5, max_lock_resets=2)
+    rest_o_piece(engine)
+    for frame in range(3):
+        engine.step_frame()
+    assert engine.shift_piece("l")      # First reset.
+    for frame in range(3):
+        engine.step_frame()
+    assert engine.rotate_piece("cw")    # Second reset.
+    for frame in range(3):
+        engine.step_frame()
+    assert engine.shift_piece("r")      # No resets left, so the piece keeps its 3 frames.
+    engine.step_frame()
+    assert engine.board.cell_count == 0
+    engine.step_frame()
+    assert engine.board.cell_count == 4
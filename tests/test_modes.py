@@ -0,0 +1,94 @@
+"""Tests for the cheese race and versus game modes."""
+
+from modes import CheeseRaceEngine, attack_table, create_versus
+
+
+def assert_garbage_at_bottom(engine):
+    """Checks that the board's bottom rows are exactly the engine's garbage rows, with nothing above them."""
+    grid = engine.board.to_array()
+    first_garbage_row = engine.board.rows - len(engine.garbage_holes)
+    for row, hole in enumerate(engine.garbage_holes, first_garbage_row):
+        assert grid[row].sum() == engine.board.cols - 1
+        assert not grid[row, hole]
+    assert not grid[:first_garbage_row].any()
+
+
+def clear_bottom_row(engine):
+    """Fills the hole in the board's bottom row and clears it, as if a piece had locked there."""
+    engine.board.place([(engine.board.rows - 1, engine.garbage_holes[-1])])
+    engine.resolve_tetrises(engine.check_for_tetrises([engine.board.rows - 1]))
+
+
+def clear_four(engine):
+    """Fills the bottom 4 rows of an empty board except column 0, then drops a vertical I down it."""
+    engine.board.place([(row, col) for row in range(18, 22) for col in range(1, 10)])
+    engine.pose = (0, 1, 0, -2)
+    engine.hard_drop()
+
+
+def test_cheese_garbage_cleared_and_refilled():
+    engine = CheeseRaceEngine(seed=1, lines=6, visible_lines=4)
+    assert len(engine.garbage_holes) == 4
+    assert all(above != below for above, below in zip(engine.garbage_holes, engine.garbage_holes[1:]))
+    assert_garbage_at_bottom(engine)
+    for cleared in range(1, 7):
+        clear_bottom_row(engine)
+        assert engine.lines_left == 6 - cleared
+        assert len(engine.garbage_holes) == min(4, 6 - cleared)
+        assert_garbage_at_bottom(engine)
+        assert engine.finished == (cleared == 6)
+    assert engine.board.cell_count == 0
+
+
+def test_versus_attack_cancels_pending_garbage():
+    first, second = create_versus(seed=1)
+    first.create_piece()
+    first.receive_attack(3)
+    clear_four(first)
+    # A 4 line clear attacks with attack_table[4] rows, 3 of which cancel the waiting garbage.
+    assert first.pending_garbage == []
+    assert second.pending_garbage == [attack_table[4] - 3]
+    assert first.lines_sent == attack_table[4] - 3
+    assert first.lines_received == 0
+
+
+def test_versus_partial_cancel_sends_nothing():
+    first, second = create_versus(seed=2)
+    first.create_piece()
+    first.receive_attack(1)
+    first.receive_attack(4)
+    clear_four(first)
+    assert first.pending_garbage == [1]
+    assert second.pending_garbage == []
+
+
+def test_versus_mode_state_undo_and_restore():
+    first, second = create_versus(seed=3, history_size=10)
+    first.create_piece()
+    first.receive_attack(2)
+    before, snapshot = first.mode_state, first.snapshot()
+    first.hard_drop()   # Locks without clearing, so the waiting garbage comes in.
+    after = first.mode_state
+    assert first.pending_garbage == [] and first.lines_received == 2
+    assert first.board.row_counts[-2:] == [9, 9]
+
+    assert first.undo()
+    assert first.mode_state == before
+    assert first.board.cell_count == 0
+    assert first.redo()
+    assert first.mode_state == after
+
+    first.restore(snapshot)
+    assert first.mode_state == before
+    assert first.pending_garbage == [2]
+
+
+def test_cheese_mode_state_restore():
+    engine = CheeseRaceEngine(seed=4, lines=5, visible_lines=3)
+    before, snapshot = engine.mode_state, engine.snapshot()
+    clear_bottom_row(engine)
+    assert engine.mode_state != before
+    engine.restore(snapshot)
+    assert engine.mode_state == before
+    assert engine.lines_left == 5
+    assert_garbage_at_bottom(engine)
@@ -0,0 +1,52 @@
+"""Tests for the piece randomizers and the engine's piece queue."""
+
+import pytest
+
+from engine import GameEngine
+from randomizer import BagRandomizer, create_randomizer, randomizers
+
+
+def deal(randomizer, count):
+    """Returns the next count pieces the randomizer deals."""
+    return [randomizer.next() for piece in range(count)]
+
+
+@pytest.mark.parametrize("kind", sorted(randomizers))
+def test_same_seed_same_pieces(kind):
+    first, second = create_randomizer(kind, 7, seed=5), create_randomizer(kind, 7, seed=5)
+    pieces = deal(first, 100)
+    assert pieces == deal(second, 100)
+    assert set(pieces) == set(range(7))
+    assert pieces != deal(create_randomizer(kind, 7, seed=6), 100)
+
+
+@pytest.mark.parametrize("kind", sorted(randomizers))
+def test_state_round_trip(kind):
+    randomizer = create_randomizer(kind, 7, seed=8)
+    deal(randomizer, 3)     # Part way through a bag, with some history.
+    state = randomizer.getstate()
+    pieces = deal(randomizer, 50)
+    randomizer.setstate(state)
+    assert deal(randomizer, 50) == pieces
+
+    other = create_randomizer(kind, 7, seed=9)
+    other.setstate(state)
+    assert deal(other, 50) == pieces
+
+
+@pytest.mark.parametrize("count", [1, 7, 18])
+def test_bags_are_permutations(count):
+    randomizer = BagRandomizer(count, seed=count)
+    for bag in range(20):
+        assert sorted(deal(randomizer, count)) == list(range(count))
+
+
+@pytest.mark.parametrize("kind", sorted(randomizers))
+def test_queue_keeps_dealing_order(kind):
+    engine = GameEngine(seed=4, randomizer=kind, queue_size=3)
+    expected = deal(create_randomizer(kind, len(engine.pieces), seed=4), 33)
+    assert list(engine.queue) == expected[:3]
+    for spawn in range(30):     # Spawning over the live piece places nothing, so the game can't end.
+        engine.create_piece()
+        assert engine.pose[0] == expected[spawn]
+        assert list(engine.queue) == expected[spawn + 1:spawn + 4]
@@ -0,0 +1,84 @@
+"""Tests for SharedRing's claim/publish/peek/release protocol."""
+
+import multiprocessing
+import threading
+
+import numpy as np
+import pytest
+
+from ring import SharedRing
+from simulate import ring_fields, simulate
+
+fields = (("step", (), "int64"), ("board", (4, 3), "uint8"))
+
+
+@pytest.fixture
+def ring():
+    """A small ring with 2 lanes, freed after the test."""
+    ring = SharedRing(4, fields, lanes=2)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def write_steps(spec, count):
+    """Writes count records to lane 1 of the ring with spec, then closes the lane."""
+    ring = SharedRing.attach(spec)
+    for step in range(count):
+        ring.write(1, step=step, board=np.full((4, 3), step % 256))
+    ring.close_lane(1)
+    ring.close()
+
+
+def test_writer_and_reader_wrap_around(ring):
+    writer = multiprocessing.Process(target=write_steps, args=(ring.spec, 50))
+    writer.start()
+    steps = []
+    while True:
+        record = ring.peek(1)
+        if record is None:
+            break
+        step = int(record["step"])
+        assert (record["board"] == step % 256).all()
+        assert not record["board"].flags.writeable
+        steps.append(step)
+        ring.release(1)
+    writer.join()
+    assert steps == list(range(50))     # 50 records through 4 slots, in order.
+    assert ring.finished(1)
+    assert not ring.finished(0)
+
+
+def test_empty_and_closed_lanes(ring):
+    assert ring.peek(0, wait=False) is None
+    assert not ring.finished(0)
+    ring.write(0, step=7)
+    ring.close_lane(0)
+    assert not ring.finished(0)     # Closed, but a record is still waiting.
+    assert int(ring.peek(0, wait=False)["step"]) == 7
+    ring.release(0)
+    assert ring.finished(0)
+    assert ring.peek(0) is None
+
+
+def test_simulate_streams_every_placement():
+    ring = SharedRing(8, ring_fields(), lanes=2)
+    totals = {"records": 0, "reward": 0}
+
+    def read():
+        for lane, record in ring.records():
+            totals["records"] += 1
+            totals["reward"] += int(record["reward"])
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        results, summary = simulate(4, seed=3, workers=2, max_pieces=30, ring=ring)
+    finally:
+        for lane in range(ring.lanes):
+            ring.close_lane(lane)   # simulate() closes them too, but not if it fails.
+        reader.join()
+        ring.close()
+        ring.unlink()
+    assert totals["records"] == sum(result.pieces for result in results)
+    assert totals["reward"] == sum(result.score for result in results)
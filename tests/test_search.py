@@ -0,0 +1,87 @@
+"""Tests for the placement search, checked against a plain breadth-first search."""
+
+import random
+from collections import deque
+
+import pytest
+
+from engine import GameEngine
+from pieces import pentominoes, tetrominoes
+from search import PlacementFinder, play_path, rotations, shifts
+
+
+def plain_search(board, pieces, start):
+    """Returns the cells of every lock position reachable from start, searching one row at a time with no shortcuts."""
+    piece_type = start[0]
+    shapes, kicks, collides = pieces.shapes[piece_type], pieces.wall_kicks[piece_type], board.collides_shape
+    if collides(shapes[start[1]], start[2], start[3]):
+        return set()
+    seen = {start}
+    queue = deque([start])
+    locked = set()
+    while queue:
+        pose = queue.popleft()
+        _, rotation, row, col = pose
+        shape = shapes[rotation]
+        moves = [(piece_type, rotation, row, col + col_step) for move, col_step in shifts
+                 if not collides(shape, row, col + col_step)]
+        for move, rotation_step in rotations:
+            new_rotation = (rotation + rotation_step) % 4
+            for row_kick, col_kick in kicks[(rotation, new_rotation)]:
+                if not collides(shapes[new_rotation], row + row_kick, col + col_kick):
+                    moves.append((piece_type, new_rotation, row + row_kick, col + col_kick))
+                    break
+        if not collides(shape, row + 1, col):
+            moves.append((piece_type, rotation, row + 1, col))
+        else:
+            locked.add(tuple(sorted((row + cell_row, col + cell_col) for cell_row, cell_col in shape.cells)))
+        for moved in moves:
+            if moved not in seen:
+                seen.add(moved)
+                queue.append(moved)
+    return locked
+
+
+def found_cells(engine, placements):
+    """Returns the cells of each placement's lock position."""
+    return {tuple(sorted(engine.cells(*placement.pose))) for placement in placements}
+
+
+@pytest.mark.parametrize("pieces", [tetrominoes, pentominoes], ids=["tetrominoes", "pentominoes"])
+def test_matches_plain_search(pieces):
+    rng = random.Random(6)
+    finder = PlacementFinder(pieces, cache_size=0)
+    for game in range(6):
+        engine = GameEngine(seed=game, pieces=pieces, placement_cache_size=0)
+        engine.create_piece()
+        for step in range(30):
+            if engine.game_over:
+                break
+            starts = [engine.pose] + [(rng.randrange(len(pieces)), rng.randrange(4), rng.randrange(-2, 3),
+                                       rng.randrange(-1, 8)) for start in range(2)]
+            for start in starts:
+                assert (found_cells(engine, finder.find(engine.board, start[0], start))
+                        == plain_search(engine.board, pieces, start))
+            play_path(engine, rng.choice(engine.placements()).path)
+
+
+def test_tall_piece_rotates_below_top():
+    # The vertical I pentomino can't turn at its spawn pose, where it would stick out of the top of the board, so the
+    # search has to try turning it on the rows below.
+    engine = GameEngine(pieces=pentominoes)
+    start = (2, 0, -2, 2)
+    placements = PlacementFinder(pentominoes, cache_size=0).find(engine.board, 2, start)
+    assert [(row, 5) for row in range(17, 22)] in [sorted(engine.cells(*placement.pose)) for placement in placements]
+    assert found_cells(engine, placements) == plain_search(engine.board, pentominoes, start)
+
+
+def test_paths_reach_their_placements():
+    engine = GameEngine(seed=7)
+    engine.create_piece()
+    rng = random.Random(7)
+    for step in range(40):
+        if engine.game_over:
+            break
+        placement = rng.choice(engine.placements())
+        assert play_path(engine, placement.path)
+        assert engine.last_lock[0] == tuple(engine.cells(*placement.pose))
@@ -0,0 +1,18 @@
+"""Tests for the simulate command's entry points."""
+
+import pytest
+
+from simulate import simulate
+
+
+def test_rejects_no_games():
+    with pytest.raises(ValueError):
+        simulate(0)
+
+
+def test_summary_covers_every_game():
+    results, summary = simulate(3, seed=2, max_pieces=10)
+    assert [result.index for result in results] == [0, 1, 2]
+    assert summary.games == 3
+    assert summary.lines == sum(result.score for result in results)
+    assert summary.min_score <= summary.mean_score <= summary.max_score
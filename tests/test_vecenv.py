@@ -0,0 +1,41 @@
+"""Tests for SubprocVecEnv's auto-reset."""
+
+import numpy as np
+
+from batch import DOWN
+from env import TetrisEnv
+from simulate import game_seed
+from vecenv import SubprocVecEnv
+
+
+def test_final_observation_kept_on_reset():
+    envs = SubprocVecEnv(2, workers=1, max_steps=3)
+    try:
+        envs.reset(seed=0)
+        for step in range(3):
+            observations, rewards, terminated, truncated, infos = envs.step(np.full(2, DOWN))
+    finally:
+        envs.close()
+    assert truncated.all()
+    assert infos["_final_observation"].all()
+
+    for index in range(2):
+        env = TetrisEnv(max_steps=3)
+        env.reset(game_seed(0, index))
+        for step in range(3):
+            observation = env.step(DOWN)[0]
+        assert (infos["final_observation"][index] == observation).all()
+        # The returned observation is from the new game, with its piece back at the top.
+        assert not (observations[index] == observation).all()
+
+
+def test_final_observation_empty_while_playing():
+    envs = SubprocVecEnv(3, workers=2)
+    try:
+        envs.reset(seed=1)
+        observations, rewards, terminated, truncated, infos = envs.step(np.zeros(3, dtype=np.int64))
+    finally:
+        envs.close()
+    assert not infos["_final_observation"].any()
+    assert not infos["final_observation"].any()
+    assert infos["final_observation"].shape == observations.shape
@@ -0,0 +1,189 @@
+"""Vectorized TetrisEnv that runs many environments across worker processes.
+SubprocVecEnv splits count environments into one shard per worker process.  Each step sends every worker one message
+with its shard's actions, and each worker steps its whole shard and answers with one message of stacked arrays, so
+the number of messages per step depends on the number of workers, not the number of environments.
+Games that are lost or truncated are reset inside their worker, straight away, so every observation a step returns is
+from a live game.  The last observation, score and pieces of the games that ended are in the step's info, so a learner
+can still bootstrap from the last state of a truncated game.
+Every environment gets its own seed, derived from the vector's seed and the environment's index, so a seeded vector
+plays the same games however it is split across workers.
+Usage: python vecenv.py --envs 64 --workers 8 measures how many steps per second the workers make.
+"""
+
+import argparse
+import multiprocessing
+import time
+import numpy as np
+from env import TetrisEnv
+from simulate import game_seed
+
+
+def _run_worker(connection, indices, actions, options):
+    """Steps a shard of environments for SubprocVecEnv, answering one message with one message, until told to close.
+    indices: the indices of the shard's environments in the whole vector.
+    """
+    envs = [TetrisEnv(actions, **options) for index in indices]
+    while True:
+        command, data = connection.recv()
+        if command == "close":
+            break
+        try:
+            if command == "reset":
+                results = [env.reset(None if data is None else game_seed(data, index))
+                           for env, index in zip(envs, indices)]
+                observations, infos = zip(*results)
+                connection.send((np.stack(observations), _stack_infos(envs, infos)))
+            elif command == "step":
+                connection.send(_step_shard(envs, data))
+        except Exception as error:
+            connection.send(error)
+    connection.close()
+
+
+def _step_shard(envs, actions):
+    """Steps each environment in a shard, resetting those whose games end.
+    Returns (observations, rewards, terminated, truncated, infos), stacked.
+    """
+    count = len(envs)
+    observations = np.empty((count,) + envs[0].observation_space.shape, dtype=np.uint8)
+    rewards = np.zeros(count, dtype=np.int64)
+    terminated = np.zeros(count, dtype=bool)
+    truncated = np.zeros(count, dtype=bool)
+    final_observations = np.zeros_like(observations)
+    ended = np.zeros(count, dtype=bool)
+    final_scores = np.zeros(count, dtype=np.int64)
+    final_pieces = np.zeros(count, dtype=np.int64)
+    infos = []
+    for index, (env, action) in enumerate(zip(envs, actions)):
+        observation, rewards[index], terminated[index], truncated[index], info = env.step(int(action))
+        if terminated[index] or truncated[index]:
+            final_observations[index] = observation
+            ended[index] = True
+            final_scores[index] = info["score"]
+            final_pieces[index] = info["pieces"]
+            observation, info = env.reset()
+        observations[index] = observation
+        infos.append(info)
+    infos = _stack_infos(envs, infos)
+    infos["final_observation"] = final_observations
+    infos["_final_observation"] = ended
+    infos["final_score"] = final_scores
+    infos["final_pieces"] = final_pieces
+    return observations, rewards, terminated, truncated, infos
+
+
+def _stack_infos(envs, infos):
+    """Returns the numeric entries of a shard's info dicts, stacked into arrays by key."""
+    stacked = {key: np.array([info[key] for info in infos], dtype=np.int64) for key in ("score", "pieces", "steps")}
+    if envs[0].actions == "placements":
+        stacked["action_mask"] = np.stack([info["action_mask"] for info in infos])
+    return stacked
+
+
+class SubprocVecEnv:
+    """count TetrisEnvs, stepped together in worker processes.
+    count: how many environments to run.
+    workers: how many processes to run them in.  Each gets an equal share of the environments, give or take one.
+    actions: "keys" or "placements"; see env.py.
+    Other arguments are passed to every TetrisEnv.
+    reset() and step() return arrays with a row for each environment, and info dicts of arrays:
+    score, pieces, steps: as in TetrisEnv's info, for each environment's current game.
+    final_observation: from step(), the last observation of each game that just ended (all 0s where none did).
+    _final_observation: from step(), which environments' games just ended, as in Gym's vector environments.
+    final_score, final_pieces: from step(), the score and pieces of each game that just ended (0 where none did).
+    action_mask: in placements mode, which actions each environment can take.
+    Call close() when done, to stop the workers.
+    """
+
+    def __init__(self, count, workers=None, actions="keys", **options):
+        workers = min(count, workers or multiprocessing.cpu_count())
+        env = TetrisEnv(actions, **options)
+        self.count = count
+        self.single_observation_space = env.observation_space
+        self.single_action_space = env.action_space
+        self.shards = np.array_split(np.arange(count), workers)
+        self.connections = []
+        self.processes = []
+        for indices in self.shards:
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_run_worker,
+                                              args=(worker_connection, indices.tolist(), actions, options),
+                                              daemon=True)
+            process.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    def reset(self, seed=None):
+        """Starts a new game in every environment and returns (observations, infos).
+        seed: seeds each environment with a seed derived from it and the environment's index.  None carries on from
+        each environment's last seed.
+        """
+        for connection in self.connections:
+            connection.send(("reset", seed))
+        observations, infos = zip(*self._receive())
+        return np.concatenate(observations), self._concatenate_infos(infos)
+
+    def step(self, actions):
+        """Takes one action in each environment and returns (observations, rewards, terminated, truncated, infos).
+        actions: an array with one action for each environment.
+        """
+        actions = np.asarray(actions)
+        for connection, indices in zip(self.connections, self.shards):
+            connection.send(("step", actions[indices[0]:indices[-1] + 1]))
+        observations, rewards, terminated, truncated, infos = zip(*self._receive())
+        return (np.concatenate(observations), np.concatenate(rewards), np.concatenate(terminated),
+                np.concatenate(truncated), self._concatenate_infos(infos))
+
+    def close(self):
+        """Stops the workers."""
+        for connection in self.connections:
+            connection.send(("close", None))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def _receive(self):
+        """Returns each worker's answer, in shard order.  Raises any exception a worker ran into."""
+        results = [connection.recv() for connection in self.connections]
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def _concatenate_infos(self, infos):
+        """Returns the shards' info dicts as one, with each key's arrays concatenated."""
+        return {key: np.concatenate([info[key] for info in infos]) for key in infos[0]}
+
+
+def main():
+    """Measures how many environment steps per second a SubprocVecEnv makes with random actions."""
+    parser = argparse.ArgumentParser(description="Measure the steps per second of a SubprocVecEnv.")
+    parser.add_argument("--envs", type=int, default=64, help="how many environments to run")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="how many processes to use")
+    parser.add_argument("--actions", choices=["keys", "placements"], default="keys", help="what an action is")
+    parser.add_argument("--steps", type=int, default=1000, help="how many steps to take")
+    arguments = parser.parse_args()
+
+    envs = SubprocVecEnv(arguments.envs, arguments.workers, arguments.actions)
+    rng = np.random.default_rng(0)
+    observations, infos = envs.reset(seed=0)
+    start = time.perf_counter()
+    for step in range(arguments.steps):
+        if arguments.actions == "keys":
+            actions = rng.integers(envs.single_action_space.n, size=envs.count)
+        else:
+            # A random action each environment can take.
+            mask = infos["action_mask"]
+            actions = (rng.random(mask.shape) * mask).argmax(axis=1)
+        observations, rewards, terminated, truncated, infos = envs.step(actions)
+    elapsed = time.perf_counter() - start
+    envs.close()
+    print(format(arguments.steps * envs.count / elapsed, ".0f") + " steps per second with " + str(envs.count)
+          + " environments in " + str(len(envs.shards)) + " workers")
+
+
+if __name__ == "__main__":
+    main()
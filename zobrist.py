@@ -0,0 +1,110 @@
+"""Zobrist-style 64-bit hashing of game states.
+A state's hash is the XOR of one key per feature of the state, so when a feature changes, the hash is updated by
+XORing out the old feature's key and XORing in the new one.  Nothing is ever rehashed from scratch.
+Features are:
+Each non-empty board row: a key for (row index, row contents).  A row's contents are summarised by its fingerprint,
+the XOR of column_keys(cols)[col] over its dead cells.  The first 64 columns' keys are just their bits, so on boards up
+to 64 columns wide a row's fingerprint is its row bitmask, and a BitBoard doesn't need to store fingerprints at all.
+When rows move down after a line clear, only the moved rows' keys change, and their fingerprints move with them.
+The live piece's pose.
+Each slot of the piece queue.
+The hold slot, and whether it can be used.
+Keys are derived from fixed salts rather than a random table, so the same state hashes to the same value in every
+process and on every run.
+"""
+
+from functools import lru_cache
+
+MASK_64 = (1 << 64) - 1
+
+# Salts that keep each kind of feature's keys apart.
+COLUMN_SALT = 0x243F6A8885A308D3
+ROW_SALT = 0x13198A2E03707344
+POSE_SALT = 0xA4093822299F31D0
+QUEUE_SALT = 0x082EFA98EC4E6C89
+HOLD_SALT = 0x452821E638D01377
+
+
+def mix64(value):
+    """Returns a well-mixed 64-bit value derived from value (the splitmix64 finalizer)."""
+    value = (value + 0x9E3779B97F4A7C15) & MASK_64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return value ^ (value >> 31)
+
+
+@lru_cache(maxsize=None)
+def column_keys(cols):
+    """Returns a tuple of the keys each column contributes to a row's fingerprint.
+    Column col's key is 1 << col for the first 64 columns, and a mixed 64-bit key beyond them.
+    """
+    return tuple(1 << col if col < 64 else mix64(col ^ COLUMN_SALT) for col in range(cols))
+
+
+def mask_fingerprint(mask, keys):
+    """Returns the fingerprint of a row given as a bitmask, where bit col marks a dead cell.
+    keys: column_keys(cols)
+    """
+    if mask <= MASK_64:
+        return mask
+    fingerprint = mask & MASK_64
+    mask >>= 64
+    col = 64
+    while mask:
+        if mask & 1:
+            fingerprint ^= keys[col]
+        mask >>= 1
+        col += 1
+    return fingerprint
+
+
+@lru_cache(maxsize=None)
+def row_keys(rows):
+    """Returns a tuple of the keys each row index mixes into its row's key."""
+    return tuple(mix64(row ^ ROW_SALT) for row in range(rows))
+
+
+def row_key(row_index_key, fingerprint):
+    """Returns the key of a non-empty row.
+    row_index_key: row_keys(rows)[row]
+    fingerprint: the XOR of column_keys(cols)[col] over the row's dead cells.
+    """
+    return mix64(fingerprint ^ row_index_key)
+
+
+def pose_key(pose):
+    """Returns the key of the live piece's pose, or 0 if there is no live piece.
+    pose: (piece_type, rotation, row, col), or None.
+    """
+    if pose is None:
+        return 0
+    piece_type, rotation, row, col = pose
+    return mix64((((piece_type * 4 + rotation) << 24 | (row & 0xFFFFFF)) << 12 | (col & 0xFFF)) ^ POSE_SALT)
+
+
+def rotate_left(value, bits):
+    """Returns the 64-bit value rotated left by bits, between 0 and 63."""
+    return (value << bits | value >> (64 - bits)) & MASK_64
+
+
+def queue_key(slot, piece_type):
+    """Returns the key of a piece type waiting in a slot of the piece queue.
+    A piece's key in slot n is its key in slot 0 rotated left by n bits, so moving the whole queue up a slot rotates
+    its hash right by 1; see advance_queue_hash().  Slots 64 apart share keys.
+    """
+    return rotate_left(mix64(piece_type ^ QUEUE_SALT), slot % 64)
+
+
+def advance_queue_hash(queue_hash, dealt, new, size):
+    """Returns the hash of a queue of size pieces after dealt leaves its front and new joins its back, in O(1).
+    queue_hash: the XOR of queue_key(slot, piece_type) over the queue before.
+    """
+    return rotate_left(queue_hash ^ queue_key(0, dealt), 63) ^ queue_key(size - 1, new)
+
+
+def hold_key(piece_type, can_hold):
+    """Returns the key of the hold slot.
+    piece_type: the held piece, or None if nothing is held.
+    can_hold: whether the live piece may still be held.
+    """
+    return mix64((((piece_type + 1) if piece_type is not None else 0) << 1 | can_hold) ^ HOLD_SALT)